@@ -0,0 +1,50 @@
+import datetime
+import streamlit as st
+
+# Intervalos entre atualizações, em segundos. No expediente começa no mínimo depois de uma
+# mudança e cresce enquanto a lista fica parada; fora dele quase não há consultas.
+INTERVALO_MINIMO = 30
+INTERVALO_MAXIMO = 300
+INTERVALO_FORA_EXPEDIENTE = 1800
+FATOR_CRESCIMENTO = 1.5
+# Com as notificações do Graph funcionando o polling é só uma rede de segurança
+INTERVALO_COM_NOTIFICACOES = 900
+
+# Horário comercial: [início, fim) em horas, de segunda a sexta
+EXPEDIENTE = (7, 19)
+
+
+def _expediente():
+    inicio, fim = st.secrets.get("EXPEDIENTE", EXPEDIENTE)
+    return int(inicio), int(fim)
+
+
+def em_expediente(agora):
+    inicio, fim = _expediente()
+    return agora.weekday() < 5 and inicio <= agora.hour < fim
+
+
+def segundos_ate_expediente(agora):
+    inicio, _ = _expediente()
+    dia = agora.date()
+    while True:
+        abertura = datetime.datetime.combine(dia, datetime.time(inicio))
+        if abertura > agora and abertura.weekday() < 5:
+            return (abertura - agora).total_seconds()
+        dia += datetime.timedelta(days=1)
+
+
+def proximo_intervalo(anterior, mudou, agora=None, espera_limitacao=None, notificacoes=False):
+    # Quanto esperar até a próxima atualização, dado o que aconteceu na última
+    agora = agora or datetime.datetime.now()
+    if notificacoes and espera_limitacao is None:
+        return max(INTERVALO_COM_NOTIFICACOES, proximo_intervalo(anterior, mudou, agora))
+    if espera_limitacao is not None:
+        # Graph limitando: respeita o Retry-After e dobra o intervalo, sem passar do máximo
+        return max(espera_limitacao, min(anterior * 2, INTERVALO_MAXIMO))
+    if not em_expediente(agora):
+        # Acorda na abertura do expediente, mesmo que falte menos que o intervalo noturno
+        return max(INTERVALO_MINIMO, min(INTERVALO_FORA_EXPEDIENTE, segundos_ate_expediente(agora)))
+    if mudou:
+        return INTERVALO_MINIMO
+    return min(max(anterior, INTERVALO_MINIMO) * FATOR_CRESCIMENTO, INTERVALO_MAXIMO)
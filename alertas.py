@@ -0,0 +1,195 @@
+import heapq
+import json
+import os
+import threading
+import time
+from collections import deque
+import pandas as pd
+import streamlit as st
+from data import DIAS_PROXIMO_VENCIMENTO, classificar_status, get_mudancas
+from persistencia import diretorio_dados, substituir_arquivo
+
+ATRASADA = "Atrasada"
+PROXIMA = "Próximo do Vencimento"
+# Tipos de alerta emitidos nas transições
+NOVA_ATRASADA, NOVA_PROXIMA, RESOLVIDA = "atrasada", "proxima", "resolvida"
+
+# Alertas recentes guardados para o letreiro e o feed JSON
+MAX_EVENTOS = 200
+# Por quanto tempo um alerta continua no letreiro das TVs
+JANELA_LETREIRO = 12 * 3600
+
+COLUNAS_EVENTO = ["Atividade", "Cliente", "Operador", "Equipe"]
+
+
+def caminho_feed():
+    return st.secrets.get("ALERTAS_ARQUIVO", os.path.join(diretorio_dados(), "alertas.json"))
+
+
+@st.cache_resource
+def _motor():
+    # Itens abertos com vencimento: id -> (status, Data Final). Os heaps ordenam por Data Final os que
+    # ainda podem mudar só com a passagem do tempo (No Prazo -> Próximo -> Atrasada); entradas de itens
+    # que mudaram depois ficam velhas no heap e são descartadas quando saem dele.
+    return {"lock": threading.Lock(), "abertos": {}, "no_prazo": [], "proximos": [], "cursores": {},
+            "referencia": None, "eventos": deque(maxlen=MAX_EVENTOS), "erro_feed": None}
+
+
+def _guardar(motor, item, status, data_final):
+    if status not in ("No Prazo", PROXIMA, ATRASADA):
+        motor["abertos"].pop(item, None)
+        return
+    motor["abertos"][item] = (status, data_final)
+    if status == "No Prazo":
+        heapq.heappush(motor["no_prazo"], (data_final, item))
+    elif status == PROXIMA:
+        heapq.heappush(motor["proximos"], (data_final, item))
+
+
+def _vencendo(motor, heap, status, limite):
+    # Tira do heap os itens em status com Data Final até limite; O(k log n) para k itens que venceram
+    ids = []
+    while heap and heap[0][0] <= limite:
+        data_final, item = heapq.heappop(heap)
+        if motor["abertos"].get(item) == (status, data_final):
+            ids.append(item)
+    return ids
+
+
+def _transicao(anterior, novo):
+    if novo == ATRASADA and anterior != ATRASADA:
+        return NOVA_ATRASADA
+    if novo == PROXIMA and anterior != PROXIMA:
+        return NOVA_PROXIMA
+    if anterior in (ATRASADA, PROXIMA) and novo not in (ATRASADA, PROXIMA):
+        return RESOLVIDA
+    return None
+
+
+def _reavaliar(motor, df, ids, hoje, agora):
+    # Reclassifica só os ids dados e devolve (eventos das transições, novos estados). Nada é gravado no
+    # motor aqui: se algo falhar no meio, a próxima avaliação refaz tudo a partir do mesmo estado.
+    presentes = df.index.intersection(pd.Index(list(ids)))
+    linhas = df.loc[presentes]
+    status = pd.Series(classificar_status(linhas, hoje), index=presentes) if len(presentes) else pd.Series(dtype=object)
+    # Vetorizado: itens sem Data Final (Sem Vencimento, data apagada) ficam com NaT
+    datas = linhas["Data Final"].dt.normalize()
+    eventos, novos = [], []
+    for item in ids:
+        anterior = motor["abertos"].get(item, (None, None))[0]
+        if item in status.index:
+            linha = linhas.loc[item]
+            novo, data_final = status[item], datas[item]
+        else:
+            linha, novo, data_final = None, None, None
+        tipo = _transicao(anterior, novo)
+        if tipo is not None:
+            evento = {"tipo": tipo, "id": item, "em": agora, "status": novo}
+            if linha is not None:
+                evento.update({coluna: None if pd.isna(linha[coluna]) else str(linha[coluna]) for coluna in COLUNAS_EVENTO})
+                evento["data_final"] = None if pd.isna(data_final) else f"{data_final:%Y-%m-%d}"
+            eventos.append(evento)
+        novos.append((item, novo, data_final))
+    return eventos, novos
+
+
+def _compactar(motor):
+    # Entradas velhas só saem do heap quando vencem; se passarem dos itens vivos, os heaps são refeitos
+    if len(motor["no_prazo"]) + len(motor["proximos"]) > 2 * len(motor["abertos"]) + MAX_EVENTOS:
+        _refazer_heaps(motor)
+
+
+def _refazer_heaps(motor):
+    motor["no_prazo"] = [(data, item) for item, (situacao, data) in motor["abertos"].items() if situacao == "No Prazo"]
+    motor["proximos"] = [(data, item) for item, (situacao, data) in motor["abertos"].items() if situacao == PROXIMA]
+    heapq.heapify(motor["no_prazo"])
+    heapq.heapify(motor["proximos"])
+
+
+def _reconstruir(motor, df, hoje):
+    # Partida ou lista trocada inteira: O(n), sem eventos (não há estado anterior confiável para comparar)
+    abertos = df[df["Data de Término"].isna() & df["Data Final"].notna()]
+    status = classificar_status(abertos, hoje)
+    datas = abertos["Data Final"].dt.normalize()
+    motor["abertos"] = {item: (situacao, data) for item, situacao, data in zip(abertos.index, status, datas)
+                        if situacao in ("No Prazo", PROXIMA, ATRASADA)}
+    _refazer_heaps(motor)
+
+
+def avaliar(df, hoje=None):
+    # Chamado pelo atualizador a cada versão nova dos dados (inclusive a virada do dia).
+    # Custo proporcional às mudanças: ids do diário de sincronização e itens que venceram no heap.
+    hoje = pd.Timestamp(hoje if hoje is not None else pd.Timestamp.now()).normalize()
+    motor = _motor()
+    with motor["lock"]:
+        mudancas = get_mudancas(motor["cursores"])
+        # Os cursores só andam depois da avaliação: se ela falhar, as mesmas mudanças voltam na próxima
+        cursores = {nome: seq for nome, (seq, _) in mudancas.items()}
+        reconstruido = motor["referencia"] is None or any(ids is None for _, ids in mudancas.values())
+        if reconstruido:
+            _reconstruir(motor, df, hoje)
+            motor["referencia"] = hoje
+            eventos = []
+        else:
+            ids = set().union(*(ids for _, ids in mudancas.values()))
+            virada = hoje != motor["referencia"]
+            if virada:
+                # Virada do dia: só os itens cuja Data Final cruzou um limite mudam de status
+                ids.update(_vencendo(motor, motor["no_prazo"], "No Prazo", hoje + pd.Timedelta(days=DIAS_PROXIMO_VENCIMENTO)))
+                ids.update(_vencendo(motor, motor["proximos"], PROXIMA, hoje - pd.Timedelta(days=1)))
+            try:
+                eventos, novos = _reavaliar(motor, df, ids, hoje, time.time()) if ids else ([], [])
+            except Exception:
+                # Os itens tirados dos heaps voltam (o estado deles em abertos não mudou)
+                _refazer_heaps(motor)
+                raise
+            for item, novo, data_final in novos:
+                _guardar(motor, item, novo, data_final)
+            if virada:
+                motor["referencia"] = hoje
+            motor["eventos"].extend(eventos)
+            _compactar(motor)
+        motor["cursores"] = cursores
+    # Depois de reconstruir também: na partida o feed já sai com as contagens deste processo
+    if eventos or reconstruido:
+        _gravar_feed(motor)
+    return eventos
+
+
+def _gravar_feed(motor):
+    # Feed local para outros consumidores (ex.: um bot de chat): os alertas recentes, mais novos primeiro
+    with motor["lock"]:
+        eventos = list(reversed(motor["eventos"]))
+        abertos = [situacao for situacao, _ in motor["abertos"].values()]
+    feed = {"gerado_em": time.time(), "atrasadas": abertos.count(ATRASADA), "proximas": abertos.count(PROXIMA),
+            "eventos": eventos}
+    try:
+        caminho_final = caminho_feed()
+        os.makedirs(os.path.dirname(caminho_final) or ".", exist_ok=True)
+        substituir_arquivo(caminho_final, lambda caminho: _escrever(caminho, feed))
+        motor["erro_feed"] = None
+    except OSError as erro:
+        motor["erro_feed"] = erro
+
+
+def _escrever(caminho, feed):
+    with open(caminho, "w", encoding="utf-8") as arquivo:
+        json.dump(feed, arquivo, ensure_ascii=False)
+
+
+def erro_feed():
+    return _motor()["erro_feed"]
+
+
+def alertas_recentes(janela=JANELA_LETREIRO):
+    # Eventos das últimas horas para o letreiro, mais novos primeiro
+    motor = _motor()
+    limite = time.time() - janela
+    with motor["lock"]:
+        return [evento for evento in reversed(motor["eventos"]) if evento["em"] >= limite]
+
+
+def texto_alerta(evento):
+    rotulos = {NOVA_ATRASADA: "🔴 Atrasou", NOVA_PROXIMA: "🟡 Vence em breve", RESOLVIDA: "🟢 Resolvida"}
+    detalhes = " · ".join(evento[coluna] for coluna in ["Atividade", "Cliente", "Operador"] if evento.get(coluna))
+    return f"{rotulos[evento['tipo']]}: {detalhes or evento['id']}"
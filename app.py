@@ -1,257 +1,132 @@
+import time
 import streamlit as st
 import pandas as pd
-import plotly.graph_objects as go
-from auth import get_access_token
-from data import get_processed_dataframe
-from utils import CORES_EQUIPES, MESES_EM_PORTUGUES, get_cor_desempenho
-import time
+from atualizador import obter_snapshot
+from data import get_dados_mes, get_operadores_sem_equipe, meses_disponiveis
+from cubo import get_cubo
+from figuras import sequencia_slides
+from perfis import resolver_perfil
+from utils import MESES_EM_PORTUGUES
+from carrossel import agendar_proxima_troca, fixar_fase
+from regioes import (regiao_diagnostico, regiao_equipe, regiao_graficos, regiao_indicador, regiao_info,
+                     regiao_relatorios, regiao_tabela)
+from visual import letreiro
+from alertas import alertas_recentes, texto_alerta
+from cadastro import erro_cadastro
+from metricas import contar_rerun, iniciar_endpoint, registrar_duracao
 import streamlit.components.v1 as components
 
+# Alertas mostrados de uma vez no letreiro (os mais novos)
+MAX_ALERTAS_LETREIRO = 10
+
 # Configuração inicial
-st.set_page_config(layout='wide')
+st.set_page_config(layout='wide', initial_sidebar_state='collapsed')
+inicio_rerun = time.perf_counter()
+contar_rerun()
+if "METRICAS_PORTA" in st.secrets:
+    iniciar_endpoint(int(st.secrets["METRICAS_PORTA"]))
+
+# Dados: snapshot publicado pelo atualizador em segundo plano
+snapshot = obter_snapshot()
+
+if snapshot is None:
+    st.info("Carregando dados...")
+    agendar_proxima_troca(5)
+    st.stop()
 
-# Dados
-access_token = get_access_token()
-df_completo = get_processed_dataframe(access_token)
+versao_dados, df_completo = snapshot.versao, snapshot.df
 
 if df_completo.empty:
     st.warning("Nenhum dado disponível para exibição.")
+    if erro_cadastro() is not None:
+        st.caption(f"⚠️ **Cadastro com erro:** {erro_cadastro()}")
+    # A tela volta sozinha quando chegarem itens (ex.: cadastro corrigido)
+    agendar_proxima_troca(30)
     st.stop()
 
-# Cores definidas para os status
-CORES_STATUS = {
-    "Concluída": "#00CC96",
-    "No Prazo": "#D3D3D3",
-    "Próximo do Vencimento": "#FFD700",
-    "Atrasada": "#EF553B"
-}
-
-# Filtro Principal
+# Mês exibido: o corrente ou um mês passado, escolhido na barra lateral ou fixado por ?mes=AAAA-MM
 hoje = pd.Timestamp.now().date()
-df_filtrado = df_completo[(df_completo['Data Final'].dt.month == hoje.month) & (df_completo['Data Final'].dt.year == hoje.year) | (df_completo['Status'] == 'Atrasada')]
-
-# Carrossel automático
-equipes = ['Visão Geral'] + sorted(df_filtrado['Equipe'].unique())
-intervalo_segundos = 15
-
-if 'index_equipe' not in st.session_state:
-    st.session_state.index_equipe = 0
-    st.session_state.ultimo_update = time.time()
-
-if time.time() - st.session_state.ultimo_update > intervalo_segundos:
-    st.session_state.index_equipe = (st.session_state.index_equipe + 1) % len(equipes)
-    st.session_state.ultimo_update = time.time()
-    st.rerun()
-
-equipe_atual = equipes[st.session_state.index_equipe]
-equipe_proxima = equipes[(st.session_state.index_equipe + 1) % len(equipes)]
-titulo_equipe = equipe_atual
-
-# Cálculo de KPIs
-total_exibido = len(df_filtrado[df_filtrado['Equipe'] == equipe_atual]) if equipe_atual != 'Visão Geral' else len(df_filtrado)
-atividades_concluidas = len(df_filtrado[(df_filtrado['Status'] == 'Concluída') & ((df_filtrado['Equipe'] == equipe_atual) | (equipe_atual == 'Visão Geral'))])
-atividades_no_prazo = len(df_filtrado[(df_filtrado['Status'] == 'No Prazo') & ((df_filtrado['Equipe'] == equipe_atual) | (equipe_atual == 'Visão Geral'))])
-
-if total_exibido > 0:
-    taxa_desempenho = ((atividades_concluidas + atividades_no_prazo) / total_exibido) * 100
+mes_corrente = f"{hoje:%Y-%m}"
+meses = meses_disponiveis()
+mes_url = st.query_params.get("mes", mes_corrente)
+mes_exibido = st.sidebar.selectbox(
+    "Mês", meses, index=meses.index(mes_url) if mes_url in meses else 0, key="mes",
+    format_func=lambda mes: f"{MESES_EM_PORTUGUES[int(mes[5:])]} de {mes[:4]}")
+if mes_exibido != mes_url:
+    st.query_params["mes"] = mes_exibido
+
+# Filtro Principal e agregações, calculados uma vez por versão dos dados
+if mes_exibido == mes_corrente:
+    referencia = hoje
+    versao_exibida = (versao_dados, hoje)
+    cubo = get_cubo(df_completo, versao_dados, hoje)
 else:
-    taxa_desempenho = 100.0
-
-numero_do_mes = hoje.month
-nome_do_mes = MESES_EM_PORTUGUES[numero_do_mes]
-ano_atual = hoje.year
+    # Mês passado: partições do arquivo carregadas sob demanda
+    referencia = pd.Period(mes_exibido).end_time.date()
+    versao_exibida = ((versao_dados, mes_exibido), referencia)
+    df_mes = get_dados_mes(versao_dados, mes_exibido)
+    if df_mes is None:
+        st.warning("Nenhum dado disponível para o mês escolhido.")
+        st.stop()
+    cubo = get_cubo(df_mes, versao_exibida[0], referencia)
+
+# Carrossel automático: equipes, ordem, tempo e tipos de slide vêm do perfil da TV
+perfil = resolver_perfil(st.query_params)
+equipes = sequencia_slides(cubo, tendencia=mes_exibido == mes_corrente, perfil=perfil)
+intervalo_segundos = perfil["intervalo"]
+
+# Cada região da tela é um fragmento que roda sozinho na troca de slide; o script completo só
+# roda de novo com dados novos ou mexendo num widget, e então o slide atual recomeça o intervalo
+fixar_fase(len(equipes), intervalo_segundos)
+carrossel = {"equipes": equipes, "intervalo": intervalo_segundos, "perfil": perfil, "cubo": cubo,
+             "versao": versao_exibida, "versao_dados": versao_dados, "referencia": referencia}
+inicio_emissao = time.perf_counter()
 
 # Cabeçalho mais limpo e organizado
 col_equipe, col_desempenho, col_info = st.columns([4, 3, 3])
 
 with col_equipe:
-    cor_fundo = CORES_EQUIPES.get(equipe_atual, "#262730")
-    html_bloco_colorido = f"""
-    <div style="background-color:{cor_fundo}; padding:12px; border-radius:8px; text-align:center;">
-        <h2 style="color:white; margin:0;">{titulo_equipe}</h2>
-    </div>"""
-    st.markdown(html_bloco_colorido, unsafe_allow_html=True)
+    regiao_equipe(carrossel)
 
 with col_desempenho:
-    cor_desempenho = get_cor_desempenho(taxa_desempenho)
-    html_gauge = f"""<div style="background-color:{cor_desempenho}; padding:12px; border-radius:8px; text-align:center;">
-        <h2 style="color:white; margin:0;">Desempenho: {taxa_desempenho:.0f}%</h2>
-    </div>
-    """
-    st.markdown(html_gauge, unsafe_allow_html=True)
+    regiao_indicador(carrossel)
 
 with col_info:
-    st.caption(f"📅 **Período:** {nome_do_mes} de {ano_atual}")
-    st.caption(f"🔄 **Próxima equipe:** {equipe_proxima} em {int(intervalo_segundos - (time.time() - st.session_state.ultimo_update))} segundos")
-    st.caption(f"📌 **Equipe:** {st.session_state.index_equipe} / {len(equipes)}")
-
-st.divider()
-
-# Mantendo distribuição em 3 colunas
-if equipe_atual == 'Visão Geral':
-    col1, col2, col3 = st.columns(3)
+    regiao_info(carrossel)
 
-    with col1:
-        df_percentual = pd.crosstab(df_filtrado['Equipe'], df_filtrado['Status'], normalize='index') * 100
-        status_order = ['Concluída', 'Próximo do Vencimento', 'Atrasada']
-        fig1 = go.Figure()
-        for status in status_order:
-            pattern_shape = "/" if status == "Atrasada" else ""
-            fig1.add_trace(go.Bar(y=df_percentual.index, x=df_percentual[status], name=status, orientation='h', marker_color=CORES_STATUS[status], marker_pattern_shape=pattern_shape))
-        fig1.update_layout(title='Distribuição Percentual das Atividades por Equipe', barmode='stack', legend=dict(orientation="h", y=-0.5, x=0.5, xanchor='center'))
-        st.plotly_chart(fig1, use_container_width=True)
+# Letreiro com as mudanças de prazo recentes: atrasou, vence em breve, resolvida
+alertas = alertas_recentes()
+if alertas and mes_exibido == mes_corrente:
+    letreiro([texto_alerta(alerta) for alerta in alertas[:MAX_ALERTAS_LETREIRO]])
 
-    with col2:
-        df_absoluto = pd.crosstab(df_filtrado['Equipe'], df_filtrado['Status'])
-        fig2 = go.Figure()
-        for status in status_order:
-            pattern_shape = "/" if status == "Atrasada" else ""
-            fig2.add_trace(go.Bar(x=df_absoluto.index, y=df_absoluto[status], name=status, marker_color=CORES_STATUS[status], marker_pattern_shape=pattern_shape))
-        fig2.update_layout(title='Número Absoluto das Atividades por Equipe', barmode='stack', legend=dict(orientation="h", y=-0.5, x=0.5, xanchor='center'))
-        st.plotly_chart(fig2, use_container_width=True)
-
-    with col3:
-        st.subheader("Detalhamento por Cliente")
-        tabela_cliente = pd.crosstab(df_filtrado['Cliente'], df_filtrado['Status'])
-        st.dataframe(tabela_cliente)
-else:
-    cole1, cole2, cole3 = st.columns(3)
-
-    with cole1:
-        df_tipo_pct = pd.crosstab(
-        df_filtrado[df_filtrado["Equipe"] == equipe_atual]["Atividade"],
-        df_filtrado[df_filtrado["Equipe"] == equipe_atual]["Status"],
-        normalize="index"
-    ) * 100
-
-        status_esperados = ['Concluída', 'No Prazo', 'Próximo do Vencimento', 'Atrasada']
-        
-        for status in status_esperados:
-            if status not in df_tipo_pct.columns:
-                df_tipo_pct[status] = 0
-        df_tipo_pct = df_tipo_pct[status_esperados]  # Reordena
-
-        fig1 = go.Figure()
-        for status in status_esperados:
-            fig1.add_trace(go.Bar(
-                y=df_tipo_pct.index,
-                x=df_tipo_pct[status],
-                name=status,
-                orientation='h',
-                text=df_tipo_pct[status].apply(lambda x: f'{x:.0f}%' if x > 0 else ''),
-                textposition='auto',
-                marker_color=CORES_STATUS[status],
-                marker_pattern_shape='/' if status == 'Atrasada' else ''
-            ))
-
-        fig1.update_layout(
-            title='Tipo de Atividade por Status (%)',
-            barmode='stack',
-            legend=dict(orientation='h', y=-0.2, x=0.5, xanchor='center')
-        )
-        st.plotly_chart(fig1, use_container_width=True)
-
-        df_colab_atividade = pd.crosstab(
-        df_filtrado[df_filtrado["Equipe"] == equipe_atual]["Operador"],
-        df_filtrado[df_filtrado["Equipe"] == equipe_atual]["Atividade"]
-        )
-
-        fig2 = go.Figure()
-        for atividade in df_colab_atividade.columns:
-            fig2.add_trace(go.Bar(
-                x=df_colab_atividade.index,
-                y=df_colab_atividade[atividade],
-                name=atividade,
-                text=df_colab_atividade[atividade],
-                textposition='auto',
-                orientation='v'
-            ))
-
-        fig2.update_layout(
-            title='Colaboradores x Tipo de Atividade',
-            barmode='stack',
-            legend=dict(orientation='h', y=-0.2, x=0.5, xanchor='center')
-        )
-        st.plotly_chart(fig2, use_container_width=True)
-    with cole2:
-        df_operador_pct = pd.crosstab(
-            df_filtrado[df_filtrado["Equipe"] == equipe_atual]["Operador"],
-            df_filtrado[df_filtrado["Equipe"] == equipe_atual]["Status"],
-            normalize="index"
-        ) * 100
-
-        for status in status_esperados:
-            if status not in df_operador_pct.columns:
-                df_operador_pct[status] = 0
-        df_operador_pct = df_operador_pct[status_esperados]
-
-        fig3 = go.Figure()
-        for status in status_esperados:
-            fig3.add_trace(go.Bar(
-                y=df_operador_pct.index,
-                x=df_operador_pct[status],
-                name=status,
-                orientation='h',
-                text=df_operador_pct[status].apply(lambda x: f'{x:.0f}%' if x > 0 else ''),
-                textposition='inside',
-                marker_color=CORES_STATUS[status],
-                marker_pattern_shape='/' if status == 'Atrasada' else ''
-            ))
-
-        fig3.update_layout(
-            title='Operadores x Status das Atividades (%)',
-            barmode='stack',
-            legend=dict(orientation='h', y=-0.5, x=0.5, xanchor='center')
-        )
-        st.plotly_chart(fig3, use_container_width=True)
-
-        df_operador_abs = pd.crosstab(
-            df_filtrado[df_filtrado["Equipe"] == equipe_atual]["Operador"],
-            df_filtrado[df_filtrado["Equipe"] == equipe_atual]["Status"]
-        )
-
-        for status in status_esperados:
-            if status not in df_operador_abs.columns:
-                df_operador_abs[status] = 0
-        df_operador_abs = df_operador_abs[status_esperados]
+st.divider()
 
-        fig4 = go.Figure()
-        for status in status_esperados:
-            fig4.add_trace(go.Bar(
-                x=df_operador_abs.index,
-                y=df_operador_abs[status],
-                name=status,
-                orientation='v',
-                text=df_operador_abs[status],
-                textposition='auto',
-                marker_color=CORES_STATUS[status],
-                marker_pattern_shape='/' if status == 'Atrasada' else ''
-            ))
+# Mantendo distribuição em 3 colunas: dois gráficos e a tabela
+col_graficos, col_tabela = st.columns([2, 1])
 
-        fig4.update_layout(
-            title='Operadores x Status das Atividades (Absoluto)',
-            barmode='stack',
-            legend=dict(orientation='h', y=-0.5, x=0.5, xanchor='center')
-        )
-        st.plotly_chart(fig4, use_container_width=True)
-    with cole3:
-        st.subheader("Detalhamento por Cliente")
+with col_graficos:
+    regiao_graficos(carrossel)
 
-        tabela_cliente = pd.crosstab(
-            df_filtrado[df_filtrado["Equipe"] == equipe_atual]["Cliente"],
-            df_filtrado[df_filtrado["Equipe"] == equipe_atual]["Status"]
-        )
+with col_tabela:
+    regiao_tabela(carrossel)
 
-        for status in status_esperados:
-            if status not in tabela_cliente.columns:
-                tabela_cliente[status] = 0
-        tabela_cliente = tabela_cliente[status_esperados]
-        tabela_cliente = tabela_cliente.sort_values(by='Atrasada', ascending=False)
+registrar_duracao("emissao", time.perf_counter() - inicio_emissao)
+registrar_duracao("rerun", time.perf_counter() - inicio_rerun)
 
-        # Aplica o CSS e exibe a tabela com altura igual às outras colunas
-        st.markdown('<div class="dataframe-container">', unsafe_allow_html=True)
-        st.dataframe(tabela_cliente.style.format(precision=0))
-        st.markdown('</div>', unsafe_allow_html=True)
+# Operadores das listas que não estão no cadastro de equipes (e por isso não aparecem no painel),
+# e o erro do cadastro, se houver: com ele quebrado na partida, ninguém aparece
+sem_equipe = get_operadores_sem_equipe()
+erro = erro_cadastro()
+if sem_equipe or erro is not None:
+    with st.sidebar:
+        st.subheader("Fora do cadastro")
+        if erro is not None:
+            st.caption(f"⚠️ **Cadastro com erro:** {erro}")
+        for operador, total in sorted(sem_equipe.items(), key=lambda item: -item[1]):
+            st.caption(f"⚠️ {operador}: {total} atividades")
 
+with st.sidebar:
+    regiao_relatorios(versao_exibida, mes_exibido, cubo)
 
-st.rerun()
+if st.query_params.get("diag"):
+    regiao_diagnostico()
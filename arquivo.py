@@ -0,0 +1,159 @@
+import os
+import threading
+from collections import OrderedDict
+import pandas as pd
+import streamlit as st
+from persistencia import diretorio_dados, nome_fonte, substituir_arquivo
+
+# Partições mensais mantidas em memória pela navegação histórica (as menos usadas saem primeiro)
+MAX_PARTICOES = 6
+
+
+def _diretorio(site_id, list_id):
+    return os.path.join(diretorio_dados(), "arquivo", nome_fonte(site_id, list_id))
+
+
+def _caminho_particao(site_id, list_id, mes):
+    return os.path.join(_diretorio(site_id, list_id), f"{mes}.parquet")
+
+
+def _caminho_indice(site_id, list_id):
+    return os.path.join(_diretorio(site_id, list_id), "indice.parquet")
+
+
+def _data_particao(df):
+    # Mês de vencimento; concluídas sem Data Final (o painel nunca as mostra) vão pelo mês de término
+    return df["Data Final"].fillna(df["Data de Término"])
+
+
+def mascara_arquivavel(df, hoje):
+    # Concluídas com vencimento antes do mês corrente: o painel do mês nunca mais as mostra,
+    # e o Status delas (Concluída) não muda com a data
+    inicio_mes = pd.Timestamp(hoje).normalize().replace(day=1)
+    return ((_data_particao(df) < inicio_mes) & df["Data de Término"].notna()).to_numpy()
+
+
+def meses(df):
+    return _data_particao(df).dt.strftime("%Y-%m")
+
+
+def novo_indice():
+    # id do item (inteiro, como no SharePoint) -> mês da partição; ~9 bytes por item arquivado
+    return pd.Series(pd.Categorical([]), index=pd.Index([], dtype="int64"), name="mes")
+
+
+def _ids(index):
+    return pd.Index(index).astype("int64")
+
+
+def carregar_indice(site_id, list_id):
+    try:
+        indice = pd.read_parquet(_caminho_indice(site_id, list_id))
+    except (OSError, ValueError):
+        return novo_indice()
+    return indice["mes"].astype("category")
+
+
+@st.cache_resource
+def _particoes():
+    # LRU compartilhado pelas sessões: (site, lista, mês) -> DataFrame da partição
+    return {"lock": threading.Lock(), "lru": OrderedDict()}
+
+
+def _esquecer(site_id, list_id, mes):
+    cache = _particoes()
+    with cache["lock"]:
+        cache["lru"].pop((site_id, list_id, mes), None)
+
+
+def carregar_particao(site_id, list_id, mes):
+    cache = _particoes()
+    chave = (site_id, list_id, mes)
+    with cache["lock"]:
+        if chave in cache["lru"]:
+            cache["lru"].move_to_end(chave)
+            return cache["lru"][chave]
+    try:
+        df = pd.read_parquet(_caminho_particao(site_id, list_id, mes))
+    except (OSError, ValueError):
+        df = None
+    with cache["lock"]:
+        cache["lru"][chave] = df
+        while len(cache["lru"]) > MAX_PARTICOES:
+            cache["lru"].popitem(last=False)
+    return df
+
+
+def _concatenar(blocos):
+    # Categóricas com categorias diferentes viram texto no pd.concat; voltam a ser categóricas
+    novo = pd.concat(blocos)
+    for coluna in blocos[0].select_dtypes("category").columns:
+        if not isinstance(novo[coluna].dtype, pd.CategoricalDtype):
+            novo[coluna] = novo[coluna].astype("category")
+    return novo
+
+
+def _regravar(site_id, list_id, mes, remover, incluir=None):
+    # Reescreve uma partição sem os ids em remover e com as linhas de incluir
+    caminho = _caminho_particao(site_id, list_id, mes)
+    try:
+        atual = pd.read_parquet(caminho)
+    except (OSError, ValueError):
+        atual = None
+    blocos = []
+    if atual is not None:
+        blocos.append(atual[~_ids(atual.index).isin(remover)])
+    if incluir is not None:
+        blocos.append(incluir)
+    blocos = [bloco for bloco in blocos if not bloco.empty]
+    if blocos:
+        novo = _concatenar(blocos)
+        substituir_arquivo(caminho, lambda temporario: novo.to_parquet(temporario))
+    elif atual is not None:
+        os.remove(caminho)
+    _esquecer(site_id, list_id, mes)
+
+
+def retirar(site_id, list_id, indice, ids):
+    # Tira do arquivo os itens que mudaram ou foram removidos; devolve o índice atualizado
+    ids = pd.to_numeric(pd.Index(list(ids)), errors="coerce")
+    presentes = indice[indice.index.isin(ids)]
+    if presentes.empty:
+        return indice
+    for mes, grupo in presentes.groupby(presentes, observed=True):
+        _regravar(site_id, list_id, mes, grupo.index)
+    indice = indice[~indice.index.isin(presentes.index)]
+    _gravar_indice(site_id, list_id, indice)
+    return indice
+
+
+def arquivar(site_id, list_id, indice, df):
+    # Grava as linhas de df nas partições do seu mês (ver _data_particao); devolve o índice atualizado
+    os.makedirs(_diretorio(site_id, list_id), exist_ok=True)
+    meses_df = meses(df)
+    for mes, linhas in df.groupby(meses_df, sort=True):
+        _regravar(site_id, list_id, mes, _ids(linhas.index), linhas)
+    novos = pd.Series(meses_df.to_numpy(), index=_ids(df.index), name="mes")
+    indice = pd.concat([indice[~indice.index.isin(novos.index)].astype(str), novos]).astype("category")
+    _gravar_indice(site_id, list_id, indice)
+    return indice
+
+
+def _gravar_indice(site_id, list_id, indice):
+    # Gravado depois das partições: um id no índice sempre está na partição indicada
+    substituir_arquivo(_caminho_indice(site_id, list_id), lambda temporario: indice.to_frame().to_parquet(temporario))
+
+
+def limpar(site_id, list_id):
+    # Enumeração completa da lista (sem delta_link): o arquivo é refeito a partir dela
+    diretorio = _diretorio(site_id, list_id)
+    if os.path.isdir(diretorio):
+        for nome in os.listdir(diretorio):
+            os.remove(os.path.join(diretorio, nome))
+            if nome != "indice.parquet":
+                _esquecer(site_id, list_id, nome.removesuffix(".parquet"))
+    return novo_indice()
+
+
+def meses_arquivados(indice):
+    return sorted(indice.cat.remove_unused_categories().cat.categories)
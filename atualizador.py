@@ -0,0 +1,192 @@
+import threading
+import time
+from collections import namedtuple
+import sqlite3
+import pandas as pd
+import streamlit as st
+from agenda import INTERVALO_MINIMO, proximo_intervalo
+from alertas import avaliar
+from auth import get_access_token
+from cadastro import atualizar_cadastro
+from cubo import get_cubo
+from data import get_dados_locais, get_dados_versionados, get_erros_fontes
+from historico import registrar
+from graph import LimiteGraph
+from metricas import cronometro, exportar_arquivo, registrar_valor
+from notificacoes import ativas, iniciar_notificacoes, mudanca_sem_aviso, notificacoes_configuradas
+from quiosque import diretorio_quiosque, exportar
+
+# Foto imutável dos dados publicada pelo atualizador; as sessões só leem
+Snapshot = namedtuple("Snapshot", ["versao", "df", "gerado_em"])
+
+# Quanto uma sessão espera pelo primeiro snapshot antes de mostrar "carregando"
+ESPERA_PRIMEIRO_SNAPSHOT = 20
+
+
+def _atualizar(estado, somente=None):
+    # Devolve True quando publicou um snapshot novo; somente: listas avisadas por notificação
+    estado["ultima_tentativa"] = time.time()
+    try:
+        access_token = get_access_token()
+        # Cadastro de operadores numa lista do SharePoint: uma edição lá remapeia os itens já em memória
+        atualizar_cadastro(access_token)
+        versao, df = get_dados_versionados(access_token, forcar=True, somente=somente)
+    except Exception as erro:
+        # Mantém o último snapshot bom; o erro fica registrado para diagnóstico
+        estado["erro"] = erro
+        return False
+    estado["erro"] = None
+    # Sincronização bem-sucedida mesmo sem mudança: é a hora que a TV mostra quando a próxima falhar
+    estado["sincronizado_em"] = time.time()
+    # Listas que falharam nesta rodada continuam no snapshot com os últimos dados bons
+    estado["erros_fontes"] = get_erros_fontes()
+    atual = estado["snapshot"]
+    if atual is None or atual.versao != versao:
+        hoje = pd.Timestamp.now().date()
+        if somente is None and atual is not None and pd.Timestamp.fromtimestamp(atual.gerado_em).date() == hoje:
+            # Mudança nos itens (não a virada do dia) achada pelo polling: confere se veio aviso
+            mudanca_sem_aviso(estado["notificacoes"])
+        # O histórico é gravado antes de publicar: o slide de tendência desta versão já o inclui
+        _registrar_historico(estado, versao, df)
+        _avaliar_alertas(estado, df, hoje)
+        estado["snapshot"] = Snapshot(versao, df, time.time())
+        estado["pronto"].set()
+        _exportar_quiosque(estado, estado["snapshot"])
+        return True
+    return False
+
+
+def _espera_limitacao(estado):
+    # Maior Retry-After entre as falhas por limitação do Graph desta rodada, ou None
+    erros = [estado["erro"], *estado["erros_fontes"].values()]
+    esperas = [erro.espera for erro in erros if isinstance(erro, LimiteGraph)]
+    return max(esperas) if esperas else None
+
+
+def _registrar_historico(estado, versao, df):
+    hoje = pd.Timestamp.now().date()
+    try:
+        with cronometro("historico"):
+            registrar(versao, hoje, get_cubo(df, versao, hoje))
+    except (sqlite3.Error, OSError) as erro:
+        estado["erro_historico"] = erro
+    else:
+        estado["erro_historico"] = None
+
+
+def _avaliar_alertas(estado, df, hoje):
+    # Só as transições desde a versão anterior (atrasou, vence em breve, resolvida)
+    try:
+        with cronometro("alertas"):
+            avaliar(df, hoje)
+    except Exception as erro:
+        estado["erro_alertas"] = erro
+    else:
+        estado["erro_alertas"] = None
+
+
+def _exportar_quiosque(estado, snapshot):
+    # Só com o modo quiosque ligado: uma renderização por versão, servida a todas as TVs
+    diretorio = diretorio_quiosque()
+    if diretorio is None:
+        return
+    try:
+        exportar(snapshot.versao, snapshot.df, diretorio)
+    except Exception as erro:
+        estado["erro_quiosque"] = erro
+    else:
+        estado["erro_quiosque"] = None
+
+
+def _carregar_local(estado):
+    # Publica na hora o que estiver gravado em disco; a reconciliação com o Graph vem em seguida
+    try:
+        local = get_dados_locais()
+    except Exception:
+        return
+    if local is not None:
+        versao, df, sincronizado_em = local
+        estado["snapshot"] = Snapshot(versao, df, sincronizado_em)
+        estado["sincronizado_em"] = sincronizado_em
+        estado["pronto"].set()
+        _exportar_quiosque(estado, estado["snapshot"])
+
+
+def _laco(estado):
+    _carregar_local(estado)
+    intervalo, somente = INTERVALO_MINIMO, None
+    while True:
+        with cronometro("atualizacao"):
+            mudou = _atualizar(estado, somente)
+        # Intervalo adaptativo: curto quando a lista muda no expediente, longo à noite e sob limitação;
+        # com as notificações ativas o polling só confere de tempos em tempos
+        intervalo = proximo_intervalo(intervalo, mudou, espera_limitacao=_espera_limitacao(estado),
+                                      notificacoes=ativas(estado["notificacoes"]))
+        estado["intervalo"] = intervalo
+        registrar_valor("intervalo_atualizacao", round(intervalo))
+        try:
+            exportar_arquivo(forcar=True)
+        except OSError:
+            pass
+        # Pedidos feitos durante a busca ficam no Event e viram uma única atualização
+        pedido = estado["pedido"].wait(timeout=intervalo)
+        with estado["lock_pedidos"]:
+            estado["pedido"].clear()
+            # Só notificações: consulta apenas as listas avisadas; timer ou pedido geral: todas
+            somente = estado["listas_pedidas"] if pedido and not estado["pedido_geral"] else None
+            estado["listas_pedidas"], estado["pedido_geral"] = set(), False
+
+
+@st.cache_resource
+def _atualizador():
+    # Uma única thread por processo busca token e dados para todas as sessões
+    estado = {"snapshot": None, "erro": None, "erro_historico": None, "erros_fontes": {}, "erro_quiosque": None,
+              "erro_alertas": None,
+              "intervalo": INTERVALO_MINIMO, "ultima_tentativa": None, "sincronizado_em": None, "notificacoes": None,
+              "pedido": threading.Event(), "pronto": threading.Event(),
+              "lock_pedidos": threading.Lock(), "listas_pedidas": set(), "pedido_geral": False}
+    if notificacoes_configuradas():
+        estado["notificacoes"] = iniciar_notificacoes(lambda listas: _pedir(estado, listas))
+    threading.Thread(target=_laco, args=(estado,), daemon=True, name="atualizador").start()
+    return estado
+
+
+def _pedir(estado, listas=None):
+    with estado["lock_pedidos"]:
+        if listas is None:
+            estado["pedido_geral"] = True
+        else:
+            estado["listas_pedidas"] |= set(listas)
+        estado["pedido"].set()
+
+
+def obter_snapshot(espera=ESPERA_PRIMEIRO_SNAPSHOT):
+    # Devolve o último snapshot publicado; só bloqueia enquanto o processo ainda não tem nenhum
+    estado = _atualizador()
+    if estado["snapshot"] is None:
+        estado["pronto"].wait(timeout=espera)
+    return estado["snapshot"]
+
+
+def solicitar_atualizacao(listas=None):
+    # Pedidos simultâneos se juntam num só ciclo de atualização; listas=None consulta todas
+    _pedir(_atualizador(), listas)
+
+
+def ultimo_erro():
+    return _atualizador()["erro"]
+
+
+def ultima_sincronizacao():
+    # Instante da última sincronização que deu certo, tenha ou não mudado a versão dos dados
+    return _atualizador()["sincronizado_em"]
+
+
+def fontes_com_erro():
+    return _atualizador()["erros_fontes"]
+
+
+def erros_etapas():
+    # Falhas das etapas depois da sincronização, que não impedem a publicação dos dados
+    estado = _atualizador()
+    return {"Histórico": estado["erro_historico"], "Alertas": estado["erro_alertas"], "Quiosque": estado["erro_quiosque"]}
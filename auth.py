@@ -1,24 +1,107 @@
+import threading
+import time
 import requests
 import streamlit as st
+from graph import TIMEOUT, get_sessao
+from metricas import cronometro, registrar_cache
+
+LOGIN_URL = "https://login.microsoftonline.com"
+
+# O token é renovado em segundo plano este tanto antes de expirar
+ANTECEDENCIA_RENOVACAO = 300
+# Abaixo disso o token em memória já não é entregue a ninguém
+MARGEM_MINIMA = 60
+
+TENTATIVAS = 4
+ESPERA_INICIAL = 2
+
+
+class FalhaToken(Exception):
+    pass
 
-@st.cache_data(ttl=3500)
-def get_access_token():
-    tenant_id = st.secrets["TENANT_ID"]
-    client_id = st.secrets["CLIENT_ID"]
-    client_secret = st.secrets["CLIENT_SECRET"]
 
-    url_token = f"https://login.microsoftonline.com/{tenant_id}/oauth2/v2.0/token"
+def solicitar_token(tenant_id, client_id, client_secret):
+    url_token = f"{st.secrets.get('LOGIN_URL', LOGIN_URL)}/{tenant_id}/oauth2/v2.0/token"
     body = {
         'grant_type': 'client_credentials',
         'client_id': client_id,
         'client_secret': client_secret,
         'scope': 'https://graph.microsoft.com/.default'
     }
-    token_request = requests.post(url_token, data=body)
+    token_request = get_sessao().post(url_token, data=body, timeout=TIMEOUT)
 
     if token_request.status_code != 200:
-        st.error(f"Falha ao obter token: {token_request.json().get('error_description')}")
-        return None
-        
+        try:
+            descricao = token_request.json().get('error_description')
+        except ValueError:
+            descricao = token_request.text
+        raise FalhaToken(f"Falha ao obter token: {descricao}")
+
     token_data = token_request.json()
-    return token_data.get("access_token")
+    # expires_in vem em segundos; 3599 é o valor que o Entra ID costuma devolver
+    return token_data["access_token"], time.time() + int(token_data.get("expires_in", 3599))
+
+
+def _solicitar_com_retentativas(credenciais):
+    espera = ESPERA_INICIAL
+    for tentativa in range(TENTATIVAS):
+        try:
+            return solicitar_token(*credenciais)
+        except (FalhaToken, requests.RequestException):
+            if tentativa == TENTATIVAS - 1:
+                raise
+            time.sleep(espera)
+            espera *= 2
+
+
+@st.cache_resource
+def _gerenciador_token(tenant_id, client_id):
+    # Um token por credencial, compartilhado pelo processo; falhas nunca ficam guardadas
+    return {"lock": threading.Lock(), "token": None, "expira_em": 0.0, "renovacao": None}
+
+
+def _renovar(gerenciador, credenciais):
+    # Roda fora do caminho de renderização; o token atual continua sendo entregue enquanto isso
+    try:
+        with cronometro("token"):
+            token, expira_em = _solicitar_com_retentativas(credenciais)
+    except (FalhaToken, requests.RequestException):
+        # O token atual ainda vale alguns minutos; tenta de novo antes que expire
+        with gerenciador["lock"]:
+            _agendar_renovacao(gerenciador, credenciais, ESPERA_INICIAL * 2 ** TENTATIVAS)
+        return
+    with gerenciador["lock"]:
+        gerenciador["token"], gerenciador["expira_em"] = token, expira_em
+        _agendar_renovacao(gerenciador, credenciais, _atraso_renovacao(expira_em))
+
+
+def _atraso_renovacao(expira_em):
+    # ANTECEDENCIA_RENOVACAO antes de expirar, mas nunca antes da metade da validade
+    validade = expira_em - time.time()
+    return max(validade - ANTECEDENCIA_RENOVACAO, validade / 2)
+
+
+def _agendar_renovacao(gerenciador, credenciais, segundos):
+    if gerenciador["renovacao"] is not None:
+        gerenciador["renovacao"].cancel()
+    timer = threading.Timer(max(segundos, 0), _renovar, args=(gerenciador, credenciais))
+    timer.daemon = True
+    timer.start()
+    gerenciador["renovacao"] = timer
+
+
+def get_access_token():
+    credenciais = (st.secrets["TENANT_ID"], st.secrets["CLIENT_ID"], st.secrets["CLIENT_SECRET"])
+    gerenciador = _gerenciador_token(credenciais[0], credenciais[1])
+
+    with gerenciador["lock"]:
+        if gerenciador["token"] is not None and time.time() < gerenciador["expira_em"] - MARGEM_MINIMA:
+            registrar_cache("token", acerto=True)
+            return gerenciador["token"]
+        registrar_cache("token", acerto=False)
+        # Sem token válido: busca agora e levanta FalhaToken se não conseguir
+        with cronometro("token"):
+            token, expira_em = _solicitar_com_retentativas(credenciais)
+        gerenciador["token"], gerenciador["expira_em"] = token, expira_em
+        _agendar_renovacao(gerenciador, credenciais, _atraso_renovacao(expira_em))
+        return token
@@ -0,0 +1,178 @@
+"""Mede token, busca, processamento, filtro, agregação e slides contra o Graph local.
+
+    python bench/benchmark.py --tamanhos 1000 10000 100000 --saida bench_output.json
+
+O resultado é um JSON com uma linha por (tamanho, etapa) para comparar versões.
+"""
+import argparse
+import json
+import logging
+import os
+import platform
+import socket
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+
+RAIZ = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, RAIZ)
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+import pandas as pd
+import streamlit as st
+from streamlit import logger as streamlit_logger
+
+import auth
+import cubo
+import data
+import graph
+import mock_graph
+import visual
+
+SITE_ID, LIST_ID = "site-local", "lista-local"
+
+
+def preparar_secrets(url_base, diretorio):
+    # O painel lê a configuração de .streamlit/secrets.toml no diretório atual
+    os.makedirs(os.path.join(diretorio, ".streamlit"), exist_ok=True)
+    with open(os.path.join(diretorio, ".streamlit", "secrets.toml"), "w", encoding="utf-8") as arquivo:
+        arquivo.write(f'''GRAPH_URL = "{url_base}/v1.0"
+LOGIN_URL = "{url_base}"
+TENANT_ID = "tenant-local"
+CLIENT_ID = "cliente-local"
+CLIENT_SECRET = "segredo-local"
+SITE_ID = "{SITE_ID}"
+LIST_ID = "{LIST_ID}"
+DIRETORIO_DADOS = "{os.path.join(diretorio, 'dados_locais')}"
+''')
+    os.chdir(diretorio)
+
+
+def medir(funcao, repeticoes, preparar=None):
+    tempos, resultado = [], None
+    for _ in range(repeticoes):
+        if preparar is not None:
+            preparar()
+        inicio = time.perf_counter()
+        resultado = funcao()
+        tempos.append(time.perf_counter() - inicio)
+    return tempos, resultado
+
+
+def _linha(itens, etapa, tempos, **extras):
+    return {"itens": itens, "etapa": etapa, "repeticoes": len(tempos),
+            "mediana_s": statistics.median(tempos), "min_s": min(tempos), "max_s": max(tempos), **extras}
+
+
+def porta_livre():
+    with socket.socket() as sock:
+        sock.bind(("127.0.0.1", 0))
+        return sock.getsockname()[1]
+
+
+def medir_tamanho(itens, repeticoes, diretorio, opcoes_servidor):
+    # Cada tamanho sobe um Graph novo na mesma porta, então os secrets continuam valendo
+    servidor, lista, _ = mock_graph.iniciar(itens, **opcoes_servidor)
+    linhas = []
+    try:
+        tempos, token = medir(auth.get_access_token, repeticoes, preparar=st.cache_resource.clear)
+        linhas.append(_linha(itens, "token", tempos))
+
+        url = f"{graph.url_graph()}/sites/{SITE_ID}/lists/{LIST_ID}/items/delta?expand=fields"
+        headers = {"Authorization": f"Bearer {token}"}
+        estatisticas = graph.nova_estatistica()
+        tempos, _ = medir(lambda: sum(1 for _ in graph.iterar_paginas(url, headers, estatisticas)), repeticoes)
+        linhas.append(_linha(itens, "busca", tempos, paginas=estatisticas["paginas"] // repeticoes,
+                             bytes=estatisticas["bytes"] // repeticoes))
+
+        tempos, _ = medir(lambda: data.fetch_sharepoint_delta(SITE_ID, LIST_ID, token), repeticoes)
+        linhas.append(_linha(itens, "busca_e_processamento", tempos))
+
+        def carga_completa():
+            return data.get_dados_versionados(token, forcar=True)
+        tempos, (_, df) = medir(carga_completa, repeticoes, preparar=lambda: _limpar_estado(diretorio))
+        linhas.append(_linha(itens, "get_processed_dataframe", tempos, linhas_df=len(df)))
+
+        lista.alterar(quantidade=max(1, itens // 1000))
+        tempos, _ = medir(carga_completa, repeticoes)
+        linhas.append(_linha(itens, "sincronizacao_delta", tempos))
+
+        hoje = pd.Timestamp.now().date()
+        tempos, df_filtrado = medir(lambda: cubo.filtrar_periodo(df, hoje), repeticoes)
+        linhas.append(_linha(itens, "filtro_df_filtrado", tempos, linhas_filtradas=len(df_filtrado)))
+
+        tempos, agregado = medir(lambda: cubo.construir_cubo(df_filtrado), repeticoes)
+        linhas.append(_linha(itens, "agregacao", tempos))
+
+        for equipe in [cubo.VISAO_GERAL] + agregado["equipes"]:
+            def renderizar():
+                if equipe == cubo.VISAO_GERAL:
+                    slide = visual.figuras_visao_geral(agregado)
+                else:
+                    slide = visual.figuras_equipe(agregado, equipe)
+                # Serializar é o que o st.plotly_chart faz antes de enviar ao navegador
+                return sum(len(valor.to_json()) for valor in slide.values() if hasattr(valor, "to_json"))
+            tempos, tamanho = medir(renderizar, repeticoes)
+            linhas.append(_linha(itens, "slide", tempos, equipe=equipe, bytes=tamanho))
+    finally:
+        servidor.shutdown()
+        servidor.server_close()
+        # Conexões keep-alive ainda apontariam para o servidor anterior
+        graph.get_sessao().close()
+    return linhas
+
+
+def _limpar_estado(diretorio):
+    st.cache_resource.clear()
+    caminho = os.path.join(diretorio, "dados_locais")
+    for nome in os.listdir(caminho) if os.path.isdir(caminho) else []:
+        os.remove(os.path.join(caminho, nome))
+
+
+def _versao_codigo():
+    try:
+        return subprocess.check_output(["git", "describe", "--always", "--dirty"], cwd=RAIZ, text=True).strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--tamanhos", type=int, nargs="+", default=[1000, 10000, 100000])
+    parser.add_argument("--repeticoes", type=int, default=3)
+    parser.add_argument("--tamanho-pagina", type=int, default=200)
+    parser.add_argument("--latencia-ms", type=int, default=0)
+    parser.add_argument("--campos-extras", type=int, default=0)
+    parser.add_argument("--saida", help="arquivo JSON de saída (padrão: stdout)")
+    args = parser.parse_args()
+
+    # Sem servidor do Streamlit os caches avisam a cada chamada; o aviso não interessa aqui
+    streamlit_logger.set_log_level(logging.ERROR)
+    opcoes_servidor = {"tamanho_pagina": args.tamanho_pagina, "latencia_ms": args.latencia_ms,
+                       "campos_extras": args.campos_extras}
+
+    porta = porta_livre()
+    opcoes_servidor["porta"] = porta
+    resultados = []
+    with tempfile.TemporaryDirectory() as diretorio:
+        preparar_secrets(f"http://127.0.0.1:{porta}", diretorio)
+        try:
+            for itens in args.tamanhos:
+                resultados.extend(medir_tamanho(itens, args.repeticoes, diretorio, opcoes_servidor))
+        finally:
+            os.chdir(RAIZ)
+
+    relatorio = {"versao": _versao_codigo(), "python": platform.python_version(), "pandas": pd.__version__,
+                 "gerado_em": time.strftime("%Y-%m-%dT%H:%M:%S"), "opcoes": vars(args), "resultados": resultados}
+    texto = json.dumps(relatorio, ensure_ascii=False, indent=2)
+    if args.saida:
+        with open(args.saida, "w", encoding="utf-8") as arquivo:
+            arquivo.write(texto)
+    else:
+        print(texto)
+
+
+if __name__ == "__main__":
+    main()
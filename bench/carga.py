@@ -0,0 +1,265 @@
+"""Teste de carga: N sessões simuladas de app.py e dashboard_tv.py num só processo.
+
+    python bench/carga.py --sessoes 8 --rodadas 20 --itens 10000 --saida carga.json
+
+Cada rodada avança o relógio do carrossel um intervalo e faz todas as sessões trocarem
+de slide, uma depois da outra: o AppTest troca o Runtime global do processo a cada execução,
+então duas execuções simultâneas se atropelam. Latência e CPU são medidas por sessão. No modo padrão (--modo fragmentos) a troca roda só as regiões
+com timer de regioes.py, como numa TV; a sessão só executa o script inteiro na primeira
+rodada e quando a versão dos dados muda. Com --modo completo toda rodada é uma execução
+completa. Mede a latência (percentis), CPU por troca, pico de memória e bytes enviados
+por sessão, e sai com código 1 quando algum orçamento é excedido ou quando alguma thread
+de script morre com exceção.
+"""
+import argparse
+import json
+import logging
+import os
+import platform
+import resource
+import statistics
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+import urllib.request
+
+RAIZ = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, RAIZ)
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+import pandas as pd
+import streamlit as st
+from streamlit import logger as streamlit_logger
+from streamlit.testing.v1 import AppTest
+
+import carrossel
+import regioes
+from benchmark import _versao_codigo, porta_livre, preparar_secrets
+
+SCRIPTS = ["app.py", "dashboard_tv.py"]
+INTERVALO_SEGUNDOS = 15
+ESPERA_RERUN = 60
+
+# Orçamentos por release; qualquer um excedido faz o teste falhar
+ORCAMENTOS = {"p95_ms": 1500, "p99_ms": 3000, "cpu_ms_por_rerun": 1000, "rss_pico_mb": 2048,
+              "bytes_por_rerun_p95": 2_000_000}
+
+
+def percentil(valores, p):
+    ordenados = sorted(valores)
+    return ordenados[min(len(ordenados) - 1, int(round(p / 100 * (len(ordenados) - 1))))]
+
+
+def _tamanho(no):
+    # Bytes dos protos dos elementos e blocos da árvore: o que o servidor manda ao navegador no rerun
+    total = no.proto.ByteSize() if getattr(no, "proto", None) is not None else 0
+    for filho in getattr(no, "children", {}).values():
+        total += _tamanho(filho)
+    return total
+
+
+def _cpu():
+    uso = resource.getrusage(resource.RUSAGE_SELF)
+    return uso.ru_utime + uso.ru_stime
+
+
+def _rss_pico_mb():
+    # ru_maxrss vem em KB no Linux e em bytes no macOS
+    pico = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    return pico / (1024 * 1024) if sys.platform == "darwin" else pico / 1024
+
+
+def _subir_graph(itens, porta, alterar_a_cada):
+    # O Graph local roda em outro processo: CPU e memória medidos aqui são só do painel
+    processo = subprocess.Popen([sys.executable, os.path.join(RAIZ, "bench", "mock_graph.py"), "--itens", str(itens),
+                                 "--porta", str(porta), "--alterar-a-cada", str(alterar_a_cada)],
+                                stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL)
+    for _ in range(100):
+        try:
+            urllib.request.urlopen(f"http://127.0.0.1:{porta}/", timeout=1)
+        except urllib.error.HTTPError:
+            return processo
+        except OSError:
+            time.sleep(0.1)
+        else:
+            return processo
+    processo.kill()
+    raise RuntimeError("Graph local não respondeu")
+
+
+_regiao_original = regioes._regiao
+# Estado da sessão que os fragmentos leem e escrevem (carrossel.py, metricas.py e este teste)
+CHAVES_SESSAO = ["fase", "index_equipe", "ultimo_update", "id_sessao", "regioes_carga", "completa_carga"]
+
+
+def _registrar_regiao(funcao, argumento, a_cada):
+    # Cada execução completa guarda na sessão as regiões com timer e seus argumentos: são elas
+    # que o navegador executa sozinhas na troca de slide
+    regioes_sessao = st.session_state.setdefault("regioes_carga", {})
+    if a_cada is None:
+        regioes_sessao.pop(funcao.__name__, None)
+    else:
+        regioes_sessao[funcao.__name__] = (funcao, argumento)
+    _regiao_original(funcao, argumento, a_cada)
+
+
+def _tique():
+    # Troca de slide de uma TV: as regiões com timer, sem o resto do script
+    import streamlit as st
+    from atualizador import obter_snapshot
+
+    regioes_sessao = st.session_state["regioes_carga"]
+    _, carrossel = regioes_sessao["_info"]
+    if obter_snapshot(espera=0).versao != carrossel["versao_dados"]:
+        # A região de informações pediria uma execução completa: quem a faz é _rerun
+        st.session_state["completa_carga"] = True
+        st.stop()
+    for funcao, argumento in list(regioes_sessao.values()):
+        funcao(argumento)
+
+
+def _executar(sessao, app):
+    app.run(timeout=ESPERA_RERUN)
+    if app.exception:
+        raise RuntimeError(f"{sessao['script']}: {app.exception[0].message}")
+    return _tamanho(app._tree)
+
+
+def _tique_sessao(sessao):
+    # O tique vê o estado da sessão (fase do carrossel, regiões) e devolve o que mudou; os widgets
+    # ficam só com a execução completa, como na página real, onde o fragmento não os toca
+    for chave in CHAVES_SESSAO:
+        if chave in sessao["app"].session_state:
+            sessao["tique"].session_state[chave] = sessao["app"].session_state[chave]
+    tamanho = _executar(sessao, sessao["tique"])
+    for chave in CHAVES_SESSAO:
+        if chave in sessao["tique"].session_state:
+            sessao["app"].session_state[chave] = sessao["tique"].session_state[chave]
+    return tamanho
+
+
+def _rerun(sessao, modo):
+    inicio, cpu_inicio = time.perf_counter(), _cpu()
+    if modo == "completo":
+        tamanho = _executar(sessao, sessao["app"])
+        sessao["completas"] += 1
+    elif "regioes_carga" not in sessao["app"].session_state:
+        # Primeira rodada (aquecimento): a execução completa que abre a TV, e um tique no mesmo slide
+        # para o AppTest do tique não pagar a própria inicialização numa rodada medida
+        tamanho = _executar(sessao, sessao["app"])
+        sessao["completas"] += 1
+        _tique_sessao(sessao)
+    else:
+        tamanho = _tique_sessao(sessao)
+        if sessao["app"].session_state["completa_carga"]:
+            sessao["app"].session_state["completa_carga"] = False
+            tamanho += _executar(sessao, sessao["app"])
+            sessao["completas"] += 1
+    return time.perf_counter() - inicio, _cpu() - cpu_inicio, tamanho
+
+
+def executar(args):
+    relogio = {"agora": time.time()}
+    carrossel.relogio = lambda: relogio["agora"]
+    regioes._regiao = _registrar_regiao
+    sessoes = [{"script": script, "app": AppTest.from_file(os.path.join(RAIZ, script), default_timeout=ESPERA_RERUN),
+                "tique": AppTest.from_function(_tique, default_timeout=ESPERA_RERUN),
+                "latencias": [], "cpu": [], "bytes": [], "completas": 0}
+               for script in args.scripts for _ in range(args.sessoes)]
+    for sessao in sessoes:
+        sessao["app"].session_state["completa_carga"] = False
+
+    # Exceção numa thread de script não chega ao AppTest: a execução abortada pareceria válida
+    erros_threads = []
+    gancho_anterior = threading.excepthook
+    threading.excepthook = lambda erro: erros_threads.append(
+        f"{erro.thread.name if erro.thread else '?'}: {erro.exc_type.__name__}: {erro.exc_value}")
+    try:
+        for rodada in range(args.aquecimento + args.rodadas):
+            if args.atualizar_a_cada and rodada and rodada % args.atualizar_a_cada == 0:
+                # Versão nova dos dados no meio do teste: cubo e figuras são recalculados
+                from atualizador import solicitar_atualizacao
+                solicitar_atualizacao()
+            for sessao in sessoes:
+                latencia, cpu, tamanho = _rerun(sessao, args.modo)
+                if erros_threads:
+                    raise RuntimeError(f"{sessao['script']}: {erros_threads[0]}")
+                if rodada >= args.aquecimento:
+                    # A primeira rodada espera a sincronização inicial e fica de fora dos percentis
+                    sessao["latencias"].append(latencia)
+                    sessao["cpu"].append(cpu)
+                    sessao["bytes"].append(tamanho)
+            relogio["agora"] += INTERVALO_SEGUNDOS
+    finally:
+        threading.excepthook = gancho_anterior
+
+    latencias = [valor for sessao in sessoes for valor in sessao["latencias"]]
+    cpus = [valor for sessao in sessoes for valor in sessao["cpu"]]
+    tamanhos = [valor for sessao in sessoes for valor in sessao["bytes"]]
+    por_script = {script: {"p50_ms": 1000 * percentil(valores, 50), "p95_ms": 1000 * percentil(valores, 95),
+                           "p99_ms": 1000 * percentil(valores, 99)}
+                  for script in args.scripts
+                  for valores in [[v for s in sessoes if s["script"] == script for v in s["latencias"]]]}
+    return {"modo": args.modo, "reruns": len(latencias),
+            "execucoes_completas": sum(sessao["completas"] for sessao in sessoes), "p50_ms": 1000 * percentil(latencias, 50),
+            "p95_ms": 1000 * percentil(latencias, 95), "p99_ms": 1000 * percentil(latencias, 99),
+            "max_ms": 1000 * max(latencias), "cpu_ms_por_rerun": 1000 * statistics.mean(cpus),
+            "cpu_ms_por_rerun_p95": 1000 * percentil(cpus, 95),
+            "rss_pico_mb": _rss_pico_mb(), "bytes_por_rerun_p50": percentil(tamanhos, 50),
+            "bytes_por_rerun_p95": percentil(tamanhos, 95),
+            "bytes_por_sessao": statistics.mean(sum(sessao["bytes"]) for sessao in sessoes),
+            "por_script": por_script}
+
+
+def verificar(medidas, orcamentos):
+    return [f"{nome}: {medidas[nome]:.0f} > {limite}" for nome, limite in orcamentos.items() if medidas[nome] > limite]
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--sessoes", type=int, default=8, help="sessões por script")
+    parser.add_argument("--rodadas", type=int, default=20)
+    parser.add_argument("--aquecimento", type=int, default=1)
+    parser.add_argument("--itens", type=int, default=10000)
+    parser.add_argument("--scripts", nargs="+", default=SCRIPTS)
+    parser.add_argument("--modo", choices=["fragmentos", "completo"], default="fragmentos",
+                        help="troca de slide pelas regiões (como nas TVs) ou pelo script inteiro")
+    parser.add_argument("--atualizar-a-cada", type=int, default=5, help="pede uma sincronização a cada tantas rodadas")
+    parser.add_argument("--saida", help="arquivo JSON de saída (padrão: stdout)")
+    for nome, limite in ORCAMENTOS.items():
+        parser.add_argument(f"--{nome.replace('_', '-')}", type=float, default=limite, dest=nome)
+    args = parser.parse_args()
+
+    streamlit_logger.set_log_level(logging.ERROR)
+    porta = porta_livre()
+    processo = _subir_graph(args.itens, porta, alterar_a_cada=2)
+    try:
+        with tempfile.TemporaryDirectory() as diretorio:
+            preparar_secrets(f"http://127.0.0.1:{porta}", diretorio)
+            try:
+                medidas = executar(args)
+            finally:
+                os.chdir(RAIZ)
+    finally:
+        processo.terminate()
+
+    orcamentos = {nome: getattr(args, nome) for nome in ORCAMENTOS}
+    falhas = verificar(medidas, orcamentos)
+    relatorio = {"versao": _versao_codigo(), "python": platform.python_version(), "pandas": pd.__version__,
+                 "gerado_em": time.strftime("%Y-%m-%dT%H:%M:%S"), "sessoes": args.sessoes * len(args.scripts),
+                 "itens": args.itens, "medidas": medidas, "orcamentos": orcamentos, "falhas": falhas}
+    texto = json.dumps(relatorio, ensure_ascii=False, indent=2)
+    if args.saida:
+        with open(args.saida, "w", encoding="utf-8") as arquivo:
+            arquivo.write(texto)
+    else:
+        print(texto)
+    if falhas:
+        print("Orçamento excedido: " + "; ".join(falhas), file=sys.stderr)
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
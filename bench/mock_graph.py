@@ -0,0 +1,340 @@
+"""Graph local para medir o painel sem tocar no SharePoint de produção.
+
+Atende o endpoint de token e as consultas de itens da lista (completa e delta) com
+uma lista sintética de tamanho, mistura de campos, paginação, latência e taxa de
+respostas 429 configuráveis.
+
+    python bench/mock_graph.py --itens 10000 --porta 8800
+
+Depois aponte o painel para ele nos secrets:
+
+    GRAPH_URL = "http://127.0.0.1:8800/v1.0"
+    LOGIN_URL = "http://127.0.0.1:8800"
+
+Também aceita assinaturas de notificação (/subscriptions), com o handshake do
+validationToken, e avisa os assinantes a cada alteração da lista. Com
+--alterar-a-cada 30 a lista muda sozinha a cada 30 s, para testar o receptor
+(NOTIFICACOES_URL = "http://127.0.0.1:8765/").
+"""
+import argparse
+import datetime
+import json
+import random
+import re
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.error import URLError
+from urllib.parse import parse_qs, quote, urlparse
+from urllib.request import Request, urlopen
+
+OPERADORES = ["Daniela", "Gilmar Couto", "Edvalda Cerqueira", "Icaro Conceição", "Moises de Jesus",
+              "Vinicius Silva", "Jerri Oliveira", "Adriano", "Paulo Cesar", "Fábio Barreto",
+              "Henrique Califano", "Anderson Dias", "Moisés de Jesus", "Matheus Gusmão",
+              "Diogo Bacelar", "Judson Cruz", "Operador Sem Equipe"]
+ATIVIDADES = ["Manutenção Preventiva", "Manutenção Corretiva", "Visita Técnica", "Relatório",
+              "Orçamento", "Instalação", "Cobrança"]
+CLIENTES = [f"Cliente {numero:03d}" for numero in range(60)]
+
+
+def _data_iso(dia):
+    return f"{dia.isoformat()}T03:00:00Z"
+
+
+def gerar_item(item_id, rng, hoje, campos_extras=0):
+    vencimento = hoje + datetime.timedelta(days=rng.randint(-90, 45))
+    fields = {
+        "id": str(item_id),
+        "field_2": rng.choice(ATIVIDADES),
+        "field_3": rng.choice(CLIENTES),
+        "field_6": _data_iso(vencimento - datetime.timedelta(days=rng.randint(1, 20))),
+        "field_8": _data_iso(vencimento),
+        "field_19": rng.choice(OPERADORES),
+    }
+    if vencimento < hoje or rng.random() < 0.3:
+        if rng.random() < 0.8:
+            fields["field_7"] = _data_iso(vencimento - datetime.timedelta(days=rng.randint(0, 3)))
+    for numero in range(campos_extras):
+        fields[f"field_{100 + numero}"] = f"texto {rng.randint(0, 10 ** 6)}"
+    return {"id": str(item_id), "lastModifiedDateTime": datetime.datetime.now(datetime.timezone.utc).strftime("%Y-%m-%dT%H:%M:%S.%fZ"), "fields": fields}
+
+
+# Subconjunto de OData suficiente para o $filter do painel: comparações em fields/*, and, or e parênteses
+_TOKEN_FILTRO = re.compile(r"\s*(\(|\)|'[^']*'|[\w/]+)")
+_OPERADORES = {"eq": lambda a, b: a == b, "ne": lambda a, b: a != b, "lt": lambda a, b: a is not None and a < b,
+               "le": lambda a, b: a is not None and a <= b, "gt": lambda a, b: a is not None and a > b,
+               "ge": lambda a, b: a is not None and a >= b}
+
+
+def compilar_filtro(texto):
+    tokens = _TOKEN_FILTRO.findall(texto)
+    posicao = 0
+
+    def proximo():
+        nonlocal posicao
+        posicao += 1
+        return tokens[posicao - 1]
+
+    def termo():
+        if tokens[posicao] == "(":
+            proximo()
+            predicado = expressao()
+            proximo()
+            return predicado
+        campo, operador, valor = proximo().removeprefix("fields/"), _OPERADORES[proximo()], proximo()
+        valor = None if valor == "null" else valor.strip("'")
+        return lambda fields: operador(fields.get(campo), valor)
+
+    def conjuncao():
+        partes = [termo()]
+        while posicao < len(tokens) and tokens[posicao] == "and":
+            proximo()
+            partes.append(termo())
+        return lambda fields: all(parte(fields) for parte in partes)
+
+    def expressao():
+        partes = [conjuncao()]
+        while posicao < len(tokens) and tokens[posicao] == "or":
+            proximo()
+            partes.append(conjuncao())
+        return lambda fields: any(parte(fields) for parte in partes)
+
+    return expressao()
+
+
+def projetar(itens, expand):
+    # expand=fields($select=a,b,c): só as colunas pedidas voltam em fields
+    selecao = re.search(r"\$select=([^)]*)", expand or "")
+    if selecao is None:
+        return itens
+    campos = set(selecao.group(1).split(",")) | {"id"}
+    return [{**item, "fields": {nome: valor for nome, valor in item["fields"].items() if nome in campos}}
+            if "fields" in item else item for item in itens]
+
+
+class ListaSintetica:
+    # Lista em memória com um log de alterações para responder consultas delta
+
+    def __init__(self, itens, campos_extras=0, semente=42):
+        self.rng = random.Random(semente)
+        self.hoje = datetime.date.today()
+        self.campos_extras = campos_extras
+        self.lock = threading.Lock()
+        self.itens = {str(i): gerar_item(i, self.rng, self.hoje, campos_extras) for i in range(1, itens + 1)}
+        self.proximo_id = itens + 1
+        self.versao = 0
+        self.log = []  # (versao, item_id)
+        self.ouvintes = []  # chamados depois de cada alteração (ex.: notificações)
+
+    def alterar(self, quantidade=1, remover=0, incluir=0):
+        with self.lock:
+            self.versao += 1
+            ids = list(self.itens)
+            for item_id in self.rng.sample(ids, min(quantidade, len(ids))):
+                self.itens[item_id] = gerar_item(int(item_id), self.rng, self.hoje, self.campos_extras)
+                self.log.append((self.versao, item_id))
+            for item_id in self.rng.sample(list(self.itens), min(remover, len(self.itens))):
+                del self.itens[item_id]
+                self.log.append((self.versao, item_id))
+            for _ in range(incluir):
+                item_id = str(self.proximo_id)
+                self.proximo_id += 1
+                self.itens[item_id] = gerar_item(int(item_id), self.rng, self.hoje, self.campos_extras)
+                self.log.append((self.versao, item_id))
+        for ouvinte in self.ouvintes:
+            ouvinte()
+
+    def instantaneo(self, desde=None):
+        with self.lock:
+            if desde is None:
+                return list(self.itens.values()), self.versao
+            alterados = {item_id for versao, item_id in self.log if versao > desde}
+            saida = [self.itens.get(item_id, {"id": item_id, "deleted": {"state": "deleted"}}) for item_id in sorted(alterados)]
+            return saida, self.versao
+
+
+def _postar(url, corpo, cabecalhos=None):
+    requisicao = Request(url, data=corpo, headers=cabecalhos or {}, method="POST")
+    with urlopen(requisicao, timeout=10) as resposta:
+        return resposta.status, resposta.read()
+
+
+def criar_servidor(lista, porta=0, tamanho_pagina=200, latencia_ms=0, taxa_429=0.0, sem_indices=False):
+    rng = random.Random(7)
+    # Páginas das consultas em andamento, como o Graph faz com $skiptoken
+    consultas = {}
+    # Assinaturas de notificação: id -> corpo da criação (notificationUrl, clientState, ...)
+    assinaturas = {}
+
+    def notificar():
+        # Como o Graph: um POST por assinatura, sem dizer o que mudou
+        for assinatura_id, assinatura in list(assinaturas.items()):
+            corpo = json.dumps({"value": [{"subscriptionId": assinatura_id, "clientState": assinatura.get("clientState"),
+                                           "changeType": "updated", "resource": assinatura["resource"],
+                                           "subscriptionExpirationDateTime": assinatura["expirationDateTime"]}]})
+            try:
+                _postar(assinatura["notificationUrl"], corpo.encode(), {"Content-Type": "application/json"})
+            except (URLError, OSError):
+                pass
+
+    lista.ouvintes.append(lambda: threading.Thread(target=notificar, daemon=True).start())
+
+    class Handler(BaseHTTPRequestHandler):
+        protocol_version = "HTTP/1.1"
+        # Cabeçalho e corpo saem em envios separados; sem isso o keep-alive esbarra no ACK atrasado do TCP
+        disable_nagle_algorithm = True
+
+        def log_message(self, *args):
+            pass
+
+        def _responder(self, status, corpo, cabecalhos=None):
+            dados = json.dumps(corpo).encode()
+            self.send_response(status)
+            self.send_header("Content-Type", "application/json")
+            self.send_header("Content-Length", str(len(dados)))
+            for nome, valor in (cabecalhos or {}).items():
+                self.send_header(nome, valor)
+            self.end_headers()
+            self.wfile.write(dados)
+
+        def _atrasar_ou_limitar(self):
+            if latencia_ms:
+                time.sleep(latencia_ms / 1000)
+            if taxa_429 and rng.random() < taxa_429:
+                self._responder(429, {"error": {"code": "TooManyRequests"}}, {"Retry-After": "1"})
+                return True
+            return False
+
+        def do_POST(self):
+            corpo = self.rfile.read(int(self.headers.get("Content-Length", 0)))
+            if self._atrasar_ou_limitar():
+                return
+            if self.path.endswith("/oauth2/v2.0/token"):
+                self._responder(200, {"token_type": "Bearer", "expires_in": 3599, "access_token": "token-local"})
+            elif self.path.endswith("/subscriptions"):
+                self._criar_assinatura(json.loads(corpo))
+            else:
+                self._responder(404, {"error": {"code": "itemNotFound"}})
+
+        def _criar_assinatura(self, pedido):
+            # Antes de aceitar, o Graph valida a URL: manda um validationToken e espera o mesmo texto de volta
+            token = f"validacao-{rng.randint(0, 10 ** 9)}"
+            separador = "&" if "?" in pedido["notificationUrl"] else "?"
+            try:
+                status, resposta = _postar(f"{pedido['notificationUrl']}{separador}validationToken={quote(token)}", b"")
+            except (URLError, OSError):
+                status, resposta = None, b""
+            if status != 200 or resposta.decode() != token:
+                self._responder(400, {"error": {"code": "InvalidRequest",
+                                                "message": "Subscription validation request failed."}})
+                return
+            assinatura_id = f"assinatura-{len(assinaturas) + 1}-{rng.randint(0, 10 ** 6)}"
+            assinaturas[assinatura_id] = dict(pedido)
+            self._responder(201, {"id": assinatura_id, **pedido})
+
+        def do_PATCH(self):
+            corpo = json.loads(self.rfile.read(int(self.headers.get("Content-Length", 0))))
+            assinatura_id = urlparse(self.path).path.rsplit("/", 1)[-1]
+            if assinatura_id not in assinaturas:
+                self._responder(404, {"error": {"code": "ResourceNotFound"}})
+                return
+            assinaturas[assinatura_id].update(corpo)
+            self._responder(200, {"id": assinatura_id, **assinaturas[assinatura_id]})
+
+        def do_DELETE(self):
+            assinatura_id = urlparse(self.path).path.rsplit("/", 1)[-1]
+            existia = assinaturas.pop(assinatura_id, None) is not None
+            self.send_response(204 if existia else 404)
+            self.send_header("Content-Length", "0")
+            self.end_headers()
+
+        def do_GET(self):
+            if self._atrasar_ou_limitar():
+                return
+            url = urlparse(self.path)
+            parametros = parse_qs(url.query)
+            base = f"http://{self.headers['Host']}{url.path}"
+            expand = parametros.get("expand", [None])[0]
+
+            if "skiptoken" in parametros:
+                consulta, inicio = parametros["skiptoken"][0].split(":")
+                itens, link_final = consultas[consulta]
+            elif url.path.endswith("/items/delta"):
+                desde = int(parametros["token"][0]) if "token" in parametros else None
+                itens, versao = lista.instantaneo(desde)
+                itens = projetar(itens, expand)
+                link_final = {"@odata.deltaLink": f"{base}?token={versao}"}
+                consulta, inicio = self._registrar(itens, link_final)
+            elif url.path.endswith("/items"):
+                itens, _ = lista.instantaneo()
+                if "$filter" in parametros:
+                    # Lista sem índice nas colunas filtradas: o Graph recusa a consulta
+                    if sem_indices:
+                        self._responder(400, {"error": {"code": "invalidRequest",
+                                                        "message": "Field cannot be referenced in filter or orderby as it is not indexed."}})
+                        return
+                    predicado = compilar_filtro(parametros["$filter"][0])
+                    itens = [item for item in itens if predicado(item["fields"])]
+                if parametros.get("$orderby") == ["lastModifiedDateTime desc"]:
+                    itens = sorted(itens, key=lambda item: item["lastModifiedDateTime"], reverse=True)
+                itens = projetar(itens, expand)
+                link_final = {}
+                consulta, inicio = self._registrar(itens, link_final)
+            else:
+                self._responder(404, {"error": {"code": "itemNotFound"}})
+                return
+
+            # $top define o tamanho da página, como no Graph; o resto vem pelo nextLink
+            tamanho = min(int(parametros.get("$top", [tamanho_pagina])[0]), tamanho_pagina)
+            inicio = int(inicio)
+            pagina = {"value": itens[inicio:inicio + tamanho]}
+            if inicio + tamanho < len(itens):
+                pagina["@odata.nextLink"] = f"{base}?skiptoken={consulta}:{inicio + tamanho}&$top={tamanho}"
+            else:
+                pagina.update(link_final)
+                consultas.pop(consulta, None)
+            self._responder(200, pagina)
+
+        def _registrar(self, itens, link_final):
+            consulta = str(len(consultas) + rng.randint(0, 10 ** 9))
+            consultas[consulta] = (itens, link_final)
+            return consulta, 0
+
+    return ThreadingHTTPServer(("127.0.0.1", porta), Handler)
+
+
+def iniciar(itens=1000, **opcoes):
+    # Sobe o servidor numa thread e devolve (servidor, lista, url_base)
+    campos_extras = opcoes.pop("campos_extras", 0)
+    lista = ListaSintetica(itens, campos_extras)
+    servidor = criar_servidor(lista, **opcoes)
+    threading.Thread(target=servidor.serve_forever, daemon=True).start()
+    return servidor, lista, f"http://127.0.0.1:{servidor.server_port}"
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--itens", type=int, default=1000)
+    parser.add_argument("--porta", type=int, default=8800)
+    parser.add_argument("--tamanho-pagina", type=int, default=200)
+    parser.add_argument("--latencia-ms", type=int, default=0)
+    parser.add_argument("--taxa-429", type=float, default=0.0)
+    parser.add_argument("--campos-extras", type=int, default=0)
+    parser.add_argument("--sem-indices", action="store_true", help="recusa $filter com 400, como uma lista sem índices")
+    parser.add_argument("--alterar-a-cada", type=float, default=0, help="altera alguns itens a cada tantos segundos")
+    args = parser.parse_args()
+
+    lista = ListaSintetica(args.itens, args.campos_extras)
+    servidor = criar_servidor(lista, args.porta, args.tamanho_pagina, args.latencia_ms, args.taxa_429, args.sem_indices)
+    print(f"Graph local em http://127.0.0.1:{servidor.server_port}/v1.0 com {args.itens} itens")
+    if args.alterar_a_cada:
+        def alterar_periodicamente():
+            while True:
+                time.sleep(args.alterar_a_cada)
+                lista.alterar(quantidade=max(1, args.itens // 1000))
+        threading.Thread(target=alterar_periodicamente, daemon=True).start()
+    servidor.serve_forever()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,146 @@
+import os
+import threading
+import time
+import tomllib
+import unicodedata
+import numpy as np
+import pandas as pd
+import streamlit as st
+from graph import iterar_paginas, url_graph
+
+# Cadastro padrão de operadores, ao lado do código; o secret EQUIPES_ARQUIVO aponta para outro
+ARQUIVO_PADRAO = os.path.join(os.path.dirname(os.path.abspath(__file__)), "equipes.toml")
+# Com o cadastro numa lista do SharePoint ([EQUIPES_LISTA] nos secrets), ela é relida neste intervalo
+INTERVALO_LISTA = 300
+
+
+def normalizar_nome(nome):
+    # "Moisés  de Jesus" e "moises de jesus" são a mesma pessoa: sem acentos, caixa nem espaços extras
+    sem_acentos = "".join(c for c in unicodedata.normalize("NFKD", str(nome)) if not unicodedata.combining(c))
+    return " ".join(sem_acentos.casefold().split())
+
+
+def montar_indice(operadores):
+    # [{nome, equipe, apelidos}] -> {nome normalizado: (nome exibido, equipe)}, incluindo os apelidos
+    indice = {}
+    for operador in operadores:
+        entrada = (operador["nome"], operador["equipe"])
+        for nome in [operador["nome"], *operador.get("apelidos", [])]:
+            indice[normalizar_nome(nome)] = entrada
+    return indice
+
+
+def _caminho_arquivo():
+    return st.secrets.get("EQUIPES_ARQUIVO", ARQUIVO_PADRAO)
+
+
+def _ler_arquivo(caminho):
+    with open(caminho, "rb") as arquivo:
+        return tomllib.load(arquivo).get("operadores", [])
+
+
+def _ler_lista(configuracao, access_token):
+    campo_nome = configuracao.get("campo_nome", "Title")
+    campo_equipe = configuracao.get("campo_equipe", "Equipe")
+    campo_apelidos = configuracao.get("campo_apelidos", "Apelidos")
+    url = f"{url_graph()}/sites/{configuracao['SITE_ID']}/lists/{configuracao['LIST_ID']}/items?expand=fields&$top=999"
+    operadores = []
+    for pagina in iterar_paginas(url, {"Authorization": f"Bearer {access_token}"}):
+        for item in pagina["value"]:
+            campos = item.get("fields", {})
+            if campos.get(campo_nome) and campos.get(campo_equipe):
+                # Apelidos numa coluna de texto, separados por ; ou ,
+                apelidos = [a.strip() for a in str(campos.get(campo_apelidos) or "").replace(";", ",").split(",")]
+                operadores.append({"nome": campos[campo_nome], "equipe": campos[campo_equipe],
+                                   "apelidos": [a for a in apelidos if a]})
+    return operadores
+
+
+@st.cache_resource
+def _cadastro():
+    # Compartilhado pelo processo; a versão só muda quando o índice muda de fato
+    return {"lock": threading.Lock(), "indice": None, "versao": 0, "origem": None, "assinatura_arquivo": None,
+            "lista_lida_em": 0.0, "erro": None}
+
+
+def _publicar(cadastro, indice, origem):
+    if indice != cadastro["indice"]:
+        cadastro["indice"] = indice
+        cadastro["versao"] += 1
+    cadastro["origem"] = origem
+    cadastro["erro"] = None
+
+
+def _recarregar_arquivo(cadastro):
+    # Recarga a quente: um stat por chamada, e o arquivo só é relido quando muda
+    caminho = _caminho_arquivo()
+    try:
+        info = os.stat(caminho)
+    except OSError as erro:
+        cadastro["erro"] = erro
+        return
+    assinatura = (caminho, info.st_mtime_ns, info.st_size)
+    if assinatura == cadastro["assinatura_arquivo"]:
+        return
+    try:
+        indice = montar_indice(_ler_arquivo(caminho))
+    except (OSError, tomllib.TOMLDecodeError, KeyError, TypeError) as erro:
+        # Cadastro com erro de digitação: fica valendo o anterior
+        cadastro["erro"] = erro
+        return
+    cadastro["assinatura_arquivo"] = assinatura
+    _publicar(cadastro, indice, "arquivo")
+
+
+def cadastro_atual():
+    # {"versao", "indice"} em vigor; com lista no SharePoint, o arquivo só vale até a primeira leitura dela
+    cadastro = _cadastro()
+    with cadastro["lock"]:
+        if cadastro["origem"] != "lista":
+            _recarregar_arquivo(cadastro)
+        return {"versao": cadastro["versao"], "indice": cadastro["indice"] or {}}
+
+
+def atualizar_cadastro(access_token, forcar=False):
+    # Chamado pelo atualizador a cada ciclo; sem [EQUIPES_LISTA] não faz nada
+    configuracao = st.secrets.get("EQUIPES_LISTA")
+    if not configuracao:
+        return
+    cadastro = _cadastro()
+    if not forcar and time.time() - cadastro["lista_lida_em"] < INTERVALO_LISTA:
+        return
+    try:
+        operadores = _ler_lista(configuracao, access_token)
+    except Exception as erro:
+        # A tentativa conta como leitura: com a lista fora do ar, o Graph não é consultado a cada ciclo
+        with cadastro["lock"]:
+            cadastro["lista_lida_em"] = time.time()
+            cadastro["erro"] = erro
+        return
+    with cadastro["lock"]:
+        cadastro["lista_lida_em"] = time.time()
+        _publicar(cadastro, montar_indice(operadores), "lista")
+
+
+def erro_cadastro():
+    return _cadastro()["erro"]
+
+
+def mapear_operadores(operadores, indice):
+    # Vetorizado sobre a categórica: o índice é consultado uma vez por nome distinto, não por linha.
+    # Devolve (Operador com o nome do cadastro, Equipe); quem não está no cadastro fica sem Equipe.
+    operadores = operadores.astype("category")
+    categorias = operadores.cat.categories
+    entradas = [indice.get(normalizar_nome(nome)) for nome in categorias]
+    nomes = [entrada[0] if entrada else nome for nome, entrada in zip(categorias, entradas)]
+    equipes = [entrada[1] if entrada else None for entrada in entradas]
+    codigos = operadores.cat.codes.to_numpy()
+
+    def recodificar(valores):
+        # Código -1 (nome ausente) aponta para o último elemento, que também é -1
+        categorias_novas = pd.Index(sorted({valor for valor in valores if valor is not None}))
+        de_para = np.append(categorias_novas.get_indexer(pd.Index(valores, dtype=object)), -1)
+        return pd.Categorical.from_codes(de_para[codigos], categories=categorias_novas)
+
+    return (pd.Series(recodificar(nomes), index=operadores.index, name="Operador"),
+            pd.Series(recodificar(equipes), index=operadores.index, name="Equipe"))
@@ -0,0 +1,53 @@
+import time
+import streamlit as st
+from streamlit_autorefresh import st_autorefresh
+
+# Relógio do carrossel; pode ser trocado por um relógio simulado
+relogio = time.time
+
+# O rerun é agendado um pouco depois da troca para não cair antes dela
+FOLGA_SEGUNDOS = 0.3
+
+
+def posicao_carrossel(total, intervalo_segundos):
+    # Devolve (índice do slide atual, segundos até o próximo) sem forçar nenhum rerun
+    agora = relogio()
+    if 'index_equipe' not in st.session_state:
+        st.session_state.index_equipe = 0
+        st.session_state.ultimo_update = agora
+
+    decorrido = agora - st.session_state.ultimo_update
+    if decorrido >= intervalo_segundos - FOLGA_SEGUNDOS:
+        # Se a TV ficou sem rerun por vários intervalos, pula direto para o slide certo
+        passos = max(1, int((decorrido + FOLGA_SEGUNDOS) // intervalo_segundos))
+        st.session_state.index_equipe += passos
+        st.session_state.ultimo_update += passos * intervalo_segundos
+    st.session_state.index_equipe %= total
+
+    tempo_restante = intervalo_segundos - (agora - st.session_state.ultimo_update)
+    return st.session_state.index_equipe, tempo_restante
+
+
+def fixar_fase(total, intervalo_segundos):
+    # Execução completa do script: o slide atual ganha o intervalo inteiro a partir de agora, e os
+    # timers dos fragmentos (que começam agora) passam a disparar em fase com as trocas
+    indice, _ = posicao_carrossel(total, intervalo_segundos)
+    st.session_state.ultimo_update = relogio()
+    st.session_state.fase = (indice, st.session_state.ultimo_update)
+    return indice
+
+
+def posicao_fragmento(total, intervalo_segundos):
+    # Dentro de um fragmento: intervalos desde a fase, arredondados, porque cada timer dispara com
+    # alguns milissegundos de diferença e todas as regiões precisam concordar no slide
+    base, inicio = st.session_state.fase
+    passos = max(0, round((relogio() - inicio) / intervalo_segundos))
+    st.session_state.index_equipe = (base + passos) % total
+    st.session_state.ultimo_update = inicio + passos * intervalo_segundos
+    return st.session_state.index_equipe, intervalo_segundos - (relogio() - st.session_state.ultimo_update)
+
+
+def agendar_proxima_troca(tempo_restante):
+    # O navegador dispara um único rerun na próxima troca de slide; entre trocas a sessão fica ociosa
+    intervalo_ms = int((max(tempo_restante, 0) + FOLGA_SEGUNDOS) * 1000)
+    st_autorefresh(interval=intervalo_ms, key="carrossel")
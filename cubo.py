@@ -0,0 +1,95 @@
+import pandas as pd
+import streamlit as st
+from metricas import cronometro, marcar_falta, medir_cache
+
+VISAO_GERAL = 'Visão Geral'
+
+# Dimensões do grão mais fino; todas as outras tabelas saem da soma sobre ele
+DIMENSOES = ["Equipe", "Operador", "Atividade", "Cliente", "Status"]
+
+# nome -> (linhas, colunas) de cada tabela do cubo
+TABELAS = {
+    "equipe_status": (["Equipe"], "Status"),
+    "cliente_status": (["Cliente"], "Status"),
+    "atividade_status": (["Equipe", "Atividade"], "Status"),
+    "operador_status": (["Equipe", "Operador"], "Status"),
+    "operador_atividade": (["Equipe", "Operador"], "Atividade"),
+    "equipe_cliente_status": (["Equipe", "Cliente"], "Status"),
+}
+
+
+def filtrar_periodo(df, hoje):
+    # Filtro Principal: vencimento no mês de referência ou atividade atrasada
+    return df[(df['Data Final'].dt.month == hoje.month) & (df['Data Final'].dt.year == hoje.year) | (df['Status'] == 'Atrasada')]
+
+
+def _calcular_kpis(equipe_status):
+    contagens = equipe_status.reindex(columns=['Concluída', 'No Prazo'], fill_value=0)
+    kpis = pd.DataFrame({
+        "total": equipe_status.sum(axis=1),
+        "concluidas": contagens['Concluída'],
+        "no_prazo": contagens['No Prazo'],
+    })
+    kpis.index = kpis.index.astype(str)
+    kpis.loc[VISAO_GERAL] = kpis.sum()
+    total = kpis["total"].where(kpis["total"] > 0)
+    kpis["taxa_desempenho"] = ((kpis["concluidas"] + kpis["no_prazo"]) / total * 100).fillna(100.0)
+    return kpis
+
+
+def construir_cubo(df_filtrado):
+    # Uma única passada agrupada sobre as linhas; o resto trabalha só com as contagens
+    contagens = df_filtrado.groupby(DIMENSOES, observed=True, dropna=False).size()
+    contagens = contagens[contagens > 0]
+
+    cubo = {"equipes": sorted(df_filtrado['Equipe'].dropna().unique())}
+    for nome, (linhas, coluna) in TABELAS.items():
+        # groupby por nível descarta chaves vazias, como o pd.crosstab fazia
+        serie = contagens.groupby(level=linhas + [coluna], observed=True).sum()
+        tabela = serie.unstack(coluna, fill_value=0)
+        tabela.columns = tabela.columns.astype(str)
+        cubo[nome] = tabela
+    cubo["kpis"] = _calcular_kpis(cubo["equipe_status"])
+    return cubo
+
+
+@st.cache_data(max_entries=8)
+def _get_cubo(_df_completo, versao, hoje):
+    marcar_falta()
+    with cronometro("filtro"):
+        df_filtrado = filtrar_periodo(_df_completo, hoje)
+    with cronometro("agregacao"):
+        cubo = construir_cubo(df_filtrado)
+    cubo["hoje"] = hoje
+    return cubo
+
+
+def get_cubo(df_completo, versao, hoje):
+    # Recalculado uma vez por versão dos dados (e por dia de referência), não a cada slide
+    with medir_cache("cubo"):
+        return _get_cubo(df_completo, versao, hoje)
+
+
+def fatia(cubo, nome, equipe, colunas=None):
+    # Tabela da equipe (linhas x colunas) no formato que o pd.crosstab devolvia
+    tabela = cubo[nome]
+    if len(TABELAS[nome][0]) > 1:
+        if equipe not in tabela.index.get_level_values(0):
+            return tabela.iloc[:0].droplevel(0)
+        tabela = tabela.xs(equipe, level=0)
+    tabela = tabela.loc[:, (tabela != 0).any()]
+    if colunas is not None:
+        tabela = tabela.reindex(columns=colunas, fill_value=0)
+    return tabela
+
+
+def percentual(tabela):
+    # Equivalente ao pd.crosstab(..., normalize="index") * 100
+    return tabela.div(tabela.sum(axis=1), axis=0) * 100
+
+
+def kpis_equipe(cubo, equipe):
+    kpis = cubo["kpis"]
+    if equipe not in kpis.index:
+        return {"total": 0, "concluidas": 0, "no_prazo": 0, "taxa_desempenho": 100.0}
+    return kpis.loc[equipe].to_dict()
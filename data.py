@@ -1,52 +1,556 @@
+import threading
+import time
+from collections import OrderedDict, deque
+from concurrent.futures import ThreadPoolExecutor
+from urllib.parse import quote, urlencode
 import requests
+import numpy as np
 import pandas as pd
 import streamlit as st
+from graph import get_graph, iterar_paginas, nova_estatistica, url_graph
+from cadastro import cadastro_atual, mapear_operadores
+from arquivo import arquivar, carregar_indice, carregar_particao, limpar, mascara_arquivavel, meses, meses_arquivados, retirar
+from persistencia import carregar_estado, salvar_estado
+from metricas import cronometro, registrar_valor
 
-@st.cache_data(ttl=600)
-def fetch_sharepoint_data(_site_id, _list_id, _access_token):
-    headers = {"Authorization": f"Bearer {_access_token}"}
-    url = f"https://graph.microsoft.com/v1.0/sites/{_site_id}/lists/{_list_id}/items?expand=fields&$top=999"
-    response = requests.get(url, headers=headers)
-    response.raise_for_status()
-    return [item["fields"] for item in response.json()["value"]]
+# Intervalo mínimo entre duas consultas delta ao Graph
+INTERVALO_SINCRONIZACAO = 60
 
-@st.cache_data(ttl=600)
-def get_processed_dataframe(access_token):
-    site_id = st.secrets["SITE_ID"]
-    list_id = st.secrets["LIST_ID"]
-    items = fetch_sharepoint_data(site_id, list_id, access_token)
-    df = pd.DataFrame(items)
-
-    FIELD_MAPPING = {
-        "field_2": "Atividade",
-        "field_3": "Cliente",
-        "field_6": "Data de Início",
-        "field_7": "Data de Término",
-        "field_8": "Data Final",
-        "field_19": "Operador"
-    }
+FIELD_MAPPING = {
+    "field_2": "Atividade",
+    "field_3": "Cliente",
+    "field_6": "Data de Início",
+    "field_7": "Data de Término",
+    "field_8": "Data Final",
+    "field_19": "Operador"
+}
+
+# Projeção ($select) das consultas: só as colunas que o painel usa
+CAMPOS_SELECIONADOS = ",".join(FIELD_MAPPING)
+
+# Sem índice nas colunas de data o Graph recusa o $filter; tenta de novo depois deste intervalo
+INTERVALO_NOVA_TENTATIVA_FILTRO = 24 * 3600
+
+# Meses históricos (partições + itens em memória) guardados prontos para a navegação
+MESES_EM_MEMORIA = 4
+
+# A sonda não enxerga exclusões: mesmo com a lista parada, refaz a consulta filtrada depois disto
+MAXIMO_SEM_BUSCA_COMPLETA = 30 * 60
+
+ORDEM_STATUS = ['Concluída', 'No Prazo', 'Próximo do Vencimento', 'Atrasada', 'Sem Vencimento']
+# Até quantos dias antes da Data Final a atividade aparece como Próximo do Vencimento
+DIAS_PROXIMO_VENCIMENTO = 3
+
+# Diário de mudanças por lista: os consumidores (ex.: alertas) leem só os ids alterados desde a última vez
+MAX_MUDANCAS = 64
+
+# Colunas de baixa cardinalidade guardadas como categóricas (crosstab/groupby sobre códigos inteiros)
+COLUNAS_CATEGORICAS = ["Equipe", "Operador", "Atividade", "Cliente"]
+
+
+
+def _processar_paginas(url, headers, estatisticas=None):
+    # Cada página é convertida em DataFrame assim que chega e o JSON bruto é descartado.
+    # Devolve (alterados, removidos, delta_link); fora da consulta delta não há removidos nem delta_link.
+    blocos, ultima_ocorrencia, delta_link = [], {}, None
+    for numero, pagina in enumerate(iterar_paginas(url, headers, estatisticas)):
+        itens = {}
+        for item in pagina["value"]:
+            removido = "deleted" in item
+            ultima_ocorrencia[item["id"]] = (numero, removido)
+            if not removido:
+                itens[item["id"]] = item["fields"]
+        with cronometro("processamento"):
+            blocos.append(processar_itens(itens))
+        delta_link = pagina.get("@odata.deltaLink", delta_link)
+
+    # Um item pode aparecer em mais de uma página: vale a última ocorrência
+    blocos = [bloco[[ultima_ocorrencia[item_id] == (numero, False) for item_id in bloco.index]]
+              for numero, bloco in enumerate(blocos) if not bloco.empty]
+    alterados = concatenar(blocos) if blocos else pd.DataFrame()
+    # Itens removidos, ou alterados e descartados no processamento (ex.: operador sem equipe)
+    removidos = set(ultima_ocorrencia) - set(alterados.index)
+    return alterados, removidos, delta_link
+
+
+def fetch_sharepoint_delta(site_id, list_id, access_token, delta_link=None, estatisticas=None):
+    # Sem delta_link a consulta enumera a lista inteira; com ele, apenas o que mudou desde então
+    headers = {"Authorization": f"Bearer {access_token}"}
+    url = delta_link or f"{url_graph()}/sites/{site_id}/lists/{list_id}/items/delta?expand=fields($select={CAMPOS_SELECIONADOS})"
+    alterados, removidos, novo_delta_link = _processar_paginas(url, headers, estatisticas)
+    return alterados, removidos, novo_delta_link or delta_link
+
+
+def filtro_periodo_graph(hoje):
+    # Mesmo predicado de cubo.filtrar_periodo, em OData: vence no mês ou está atrasada.
+    # As datas do SharePoint vêm em UTC e o painel compara sem fuso, então os limites vão em UTC.
+    inicio = pd.Timestamp(hoje).normalize().replace(day=1)
+    proximo = inicio + pd.offsets.MonthBegin(1)
+    return (f"(fields/field_8 ge '{inicio:%Y-%m-%d}T00:00:00Z' and fields/field_8 lt '{proximo:%Y-%m-%d}T00:00:00Z')"
+            f" or (fields/field_8 lt '{pd.Timestamp(hoje):%Y-%m-%d}T00:00:00Z' and fields/field_7 eq null)")
+
+
+def sondar_lista(site_id, list_id, access_token):
+    # Assinatura barata da lista: id e data do item alterado por último (uma linha, dois campos)
+    headers = {"Authorization": f"Bearer {access_token}"}
+    parametros = urlencode({"$orderby": "lastModifiedDateTime desc", "$top": 1, "$select": "id,lastModifiedDateTime"},
+                           quote_via=quote)
+    itens = get_graph(f"{url_graph()}/sites/{site_id}/lists/{list_id}/items?{parametros}", headers).json()["value"]
+    return (itens[0]["id"], itens[0]["lastModifiedDateTime"]) if itens else None
+
+
+def fetch_sharepoint_filtrado(site_id, list_id, access_token, hoje, estatisticas=None):
+    # Só os itens do período do painel, com as seis colunas mapeadas; exige colunas indexadas
+    headers = {"Authorization": f"Bearer {access_token}"}
+    parametros = urlencode({"expand": f"fields($select={CAMPOS_SELECIONADOS})",
+                            "$filter": filtro_periodo_graph(hoje), "$top": 999}, quote_via=quote)
+    url = f"{url_graph()}/sites/{site_id}/lists/{list_id}/items?{parametros}"
+    return _processar_paginas(url, headers, estatisticas)[0]
+
+
+def processar_itens(itens):
+    # itens: dict id -> fields; o DataFrame resultante é indexado pelo id do item
+    df = pd.DataFrame.from_dict(itens, orient="index")
+    if df.empty:
+        return df
     df = df.rename(columns=FIELD_MAPPING)
+    # O Graph omite campos vazios, então um lote pequeno pode não trazer alguma coluna
+    for col in FIELD_MAPPING.values():
+        if col not in df.columns:
+            df[col] = None
 
     for col in ["Data de Início", "Data Final", "Data de Término"]:
-        df[col] = pd.to_datetime(df[col], errors="coerce").dt.tz_localize(None)
-
-    colaborador_para_equipe = { "Daniela": "Comercial", "Gilmar Couto": "Operação - Litoral Norte", "Edvalda Cerqueira": "Administrativo / Financeiro", "Icaro Conceição": "Operação - Salvador", "Moises de Jesus": "Operação - Salvador", "Vinicius Silva": "Operação - Salvador", "Jerri Oliveira": "Operação - Litoral Norte", "Adriano": "Operação - Industrial", "Paulo Cesar": "Administrativo / Financeiro", "Fábio Barreto": "Operação - Salvador", "Henrique Califano": "Técnico", "Anderson Dias": "Operação - Litoral Norte", "Moisés de Jesus": "Operação - Salvador", "Matheus Gusmão": "Operação - Salvador", "Diogo Bacelar": "Técnico", "Judson Cruz": "Operação - Salvador" }
-    df["Equipe"] = df["Operador"].map(colaborador_para_equipe)
-    df.dropna(subset=["Equipe"], inplace=True)
-
-    hoje = pd.Timestamp.now().date()
-
-    def definir_status_correto(row):
-        if pd.notna(row['Data de Término']):
-            return 'Concluída'
-        if pd.notna(row['Data Final']):
-            vencimento = row['Data Final'].date()
-            if vencimento < hoje:
-                return 'Atrasada'
-            elif (vencimento - hoje).days <= 3:
-                return 'Próximo do Vencimento'
-            return 'No Prazo'
-        return 'Sem Vencimento'
-
-    df['Status'] = df.apply(definir_status_correto, axis=1)
+        df[col] = pd.to_datetime(df[col], format="ISO8601", utc=True, errors="coerce").dt.tz_localize(None)
+
+    # A Equipe não é gravada aqui: sai do cadastro na classificação, que pode mudar sem nova busca
+    for col in COLUNAS_CATEGORICAS:
+        if col in df.columns:
+            df[col] = df[col].astype("category")
     return df
+
+
+def aplicar_cadastro(df, indice):
+    # (itens com Operador e Equipe do cadastro, {operador: itens} dos que ficaram sem equipe)
+    if df.empty:
+        return df, {}
+    operador, equipe = mapear_operadores(df["Operador"], indice)
+    sem_equipe = equipe.isna().to_numpy()
+    contagem = df["Operador"][sem_equipe].value_counts()
+    df = df.assign(Operador=operador, Equipe=equipe)[~sem_equipe]
+    return df, {str(nome): int(total) for nome, total in contagem[contagem > 0].items()}
+
+
+def classificar_status(df, hoje=None):
+    # Status de todas as linhas de uma vez, relativo à data de referência (hoje por padrão)
+    hoje = pd.Timestamp(hoje if hoje is not None else pd.Timestamp.now()).normalize()
+    dias = (df["Data Final"].dt.normalize() - hoje).dt.days
+    status = np.select(
+        [df["Data de Término"].notna(), dias.isna(), dias < 0, dias <= DIAS_PROXIMO_VENCIMENTO],
+        ['Concluída', 'Sem Vencimento', 'Atrasada', 'Próximo do Vencimento'],
+        default='No Prazo'
+    )
+    return pd.Categorical(status, categories=ORDEM_STATUS)
+
+
+def aplicar_status(df, hoje=None):
+    # Novo DataFrame com a coluna Status; pode ser reavaliado para outra data sem buscar os itens
+    if df.empty:
+        # Sem itens (ex.: cadastro vazio): a coluna existe mesmo assim, para os filtros do cubo
+        return df.assign(Status=pd.Categorical([], categories=ORDEM_STATUS))
+    return df.assign(Status=classificar_status(df, hoje))
+
+
+def concatenar(blocos):
+    # pd.concat transforma categóricas com categorias diferentes em object; unifica antes
+    for col in COLUNAS_CATEGORICAS:
+        categorias = [bloco[col].cat.categories for bloco in blocos if col in bloco and isinstance(bloco[col].dtype, pd.CategoricalDtype)]
+        if not categorias:
+            continue
+        uniao = categorias[0].append(categorias[1:]).unique() if len(categorias) > 1 else categorias[0]
+        blocos = [bloco.assign(**{col: bloco[col].cat.set_categories(uniao)}) if col in bloco else bloco for bloco in blocos]
+    return pd.concat(blocos)
+
+
+def aplicar_delta(df, alterados, removidos):
+    # Devolve um novo DataFrame; o original não é modificado
+    descartar = df.index.isin(list(removidos)) | df.index.isin(alterados.index)
+    if alterados.empty:
+        return df[~descartar]
+    return concatenar([df[~descartar], alterados])
+
+
+@st.cache_resource
+def _estado_sincronizacao(site_id, list_id):
+    # Compartilhado entre todas as sessões: itens já processados e o delta_link da última consulta
+    estado = {"lock": threading.Lock(), "df": None, "delta_link": None, "sincronizado_em": 0.0, "estatisticas": None,
+              "classificado": None, "referencia": None, "versao": 0, "erro_persistencia": None,
+              "modo": None, "filtro_recusado_em": None, "erro": None,
+              "assinatura": None, "busca_completa_em": 0.0, "indice_arquivo": carregar_indice(site_id, list_id),
+              "mudancas": deque(maxlen=MAX_MUDANCAS), "seq_mudancas": 0, "versao_cadastro": None, "sem_equipe": {}}
+    # Partida a frio: começa do que foi gravado em disco e reconcilia depois pelo delta_link
+    salvo = carregar_estado(site_id, list_id)
+    if salvo is not None:
+        df, metadados = salvo
+        estado.update(df=df, delta_link=metadados["delta_link"], sincronizado_em=metadados["sincronizado_em"],
+                      versao=metadados["versao"], modo=metadados.get("modo"))
+    return estado
+
+
+def _registrar_mudancas(estado, ids):
+    # ids=None: o DataFrame foi trocado inteiro e quem acompanha as mudanças precisa recomeçar
+    estado["seq_mudancas"] += 1
+    estado["mudancas"].append((estado["seq_mudancas"], None if ids is None else frozenset(ids)))
+
+
+def _sincronizar_delta(estado, site_id, list_id, access_token, estatisticas):
+    try:
+        alterados, removidos, delta_link = fetch_sharepoint_delta(site_id, list_id, access_token, estado["delta_link"], estatisticas)
+    except requests.HTTPError as erro:
+        # 410 Gone: o delta_link expirou e a lista precisa ser enumerada de novo
+        if erro.response is None or erro.response.status_code != 410:
+            raise
+        estado["df"], estado["delta_link"] = None, None
+        alterados, removidos, delta_link = fetch_sharepoint_delta(site_id, list_id, access_token, None, estatisticas)
+
+    if estado["df"] is None:
+        estado["df"] = alterados
+        estado["classificado"] = None
+        # Enumeração completa: o arquivo mensal é refeito a partir dela
+        _atualizar_arquivo(estado, lambda indice: limpar(site_id, list_id))
+        _registrar_mudancas(estado, None)
+    elif not alterados.empty or removidos:
+        # Itens arquivados que mudaram ou sumiram saem das partições; os alterados seguem o fluxo normal
+        _atualizar_arquivo(estado, lambda indice: retirar(site_id, list_id, indice, set(alterados.index) | removidos))
+        estado["df"] = aplicar_delta(estado["df"], alterados, removidos)
+        estado["classificado"] = None
+        _registrar_mudancas(estado, set(alterados.index) | removidos)
+    mudou = estado["classificado"] is None or delta_link != estado["delta_link"]
+    estado["delta_link"] = delta_link
+    return mudou
+
+
+def _lista_inalterada(estado, site_id, list_id, access_token):
+    # No modo filtro cada busca traz o período inteiro; a sonda evita isso quando nada mudou.
+    # O dia entra na assinatura porque o próprio filtro muda com a data (itens passam a atrasar).
+    assinatura = (sondar_lista(site_id, list_id, access_token), pd.Timestamp.now().date())
+    inalterada = (estado["df"] is not None and estado["modo"] == "filtro" and assinatura == estado["assinatura"]
+                  and time.time() - estado["busca_completa_em"] < MAXIMO_SEM_BUSCA_COMPLETA)
+    if not inalterada:
+        # Guardada antes da busca: o que mudar durante ela aparece na próxima sonda
+        estado["assinatura"], estado["busca_completa_em"] = assinatura, time.time()
+    return inalterada
+
+
+def _atualizar_arquivo(estado, operacao):
+    try:
+        estado["indice_arquivo"] = operacao(estado["indice_arquivo"])
+        return True
+    except (OSError, ValueError) as erro:
+        # Sem disco os itens simplesmente ficam em memória
+        estado["erro_persistencia"] = erro
+        return False
+
+
+def _arquivar_antigos(estado, site_id, list_id):
+    # Janela quente: só o que o painel do mês pode mostrar fica em memória; o resto vai para as partições
+    if estado["df"] is None or estado["df"].empty:
+        return False
+    mascara = mascara_arquivavel(estado["df"], pd.Timestamp.now())
+    if not mascara.any():
+        return False
+    antigos = estado["df"][mascara]
+    if not _atualizar_arquivo(estado, lambda indice: arquivar(site_id, list_id, indice, antigos)):
+        return False
+    estado["df"] = estado["df"][~mascara]
+    estado["classificado"] = None
+    _registrar_mudancas(estado, antigos.index)
+    return True
+
+
+def _ids_alterados(antes, depois):
+    # Ids que entraram, saíram ou têm alguma coluna diferente; None quando não dá para comparar
+    if antes is None or list(antes.columns) != list(depois.columns):
+        return None
+    comuns = antes.index.intersection(depois.index)
+    # Um hash por linha (valores, não códigos das categóricas): a comparação é vetorizada
+    hash_antes = pd.util.hash_pandas_object(antes.loc[comuns], index=False)
+    hash_depois = pd.util.hash_pandas_object(depois.loc[comuns], index=False)
+    diferentes = comuns[hash_antes.to_numpy() != hash_depois.to_numpy()]
+    return set(diferentes) | set(antes.index.difference(depois.index)) | set(depois.index.difference(antes.index))
+
+
+def _sincronizar_filtrado(estado, site_id, list_id, access_token, estatisticas):
+    if _lista_inalterada(estado, site_id, list_id, access_token):
+        return False
+    df = fetch_sharepoint_filtrado(site_id, list_id, access_token, pd.Timestamp.now(), estatisticas).sort_index()
+    mudou = estado["df"] is None or not df.equals(estado["df"])
+    if mudou:
+        # Sem delta do Graph, as mudanças saem da comparação com a versão anterior; só a primeira carga
+        # (ou uma troca de colunas) pede que os consumidores do diário releiam tudo
+        alterados = _ids_alterados(estado["df"], df)
+        estado["df"] = df
+        estado["classificado"] = None
+        _registrar_mudancas(estado, alterados)
+    estado["delta_link"] = None
+    return mudou
+
+
+def _usar_filtro(estado):
+    # MODO_CONSULTA = "filtro" nos secrets liga o $filter no Graph, se a lista tiver os índices
+    if st.secrets.get("MODO_CONSULTA", "delta") != "filtro":
+        return False
+    recusado_em = estado.get("filtro_recusado_em")
+    return recusado_em is None or time.time() - recusado_em > INTERVALO_NOVA_TENTATIVA_FILTRO
+
+
+def _sincronizar(estado, site_id, list_id, access_token):
+    estatisticas = nova_estatistica()
+    mudou = None
+    if _usar_filtro(estado):
+        try:
+            mudou = _sincronizar_filtrado(estado, site_id, list_id, access_token, estatisticas)
+            estado["modo"] = "filtro"
+        except requests.HTTPError as erro:
+            # 400: colunas sem índice; volta para a lista inteira e filtra no cliente
+            if erro.response is None or erro.response.status_code != 400:
+                raise
+            estado["filtro_recusado_em"] = time.time()
+    if mudou is None:
+        if estado.get("modo") == "filtro":
+            # O DataFrame atual é só o recorte do período: a consulta delta precisa começar do zero
+            estado["df"], estado["delta_link"] = None, None
+        mudou = _sincronizar_delta(estado, site_id, list_id, access_token, estatisticas)
+        mudou = _arquivar_antigos(estado, site_id, list_id) or mudou
+        estado["modo"] = "delta"
+
+    estado["sincronizado_em"] = time.time()
+    estado["estatisticas"] = estatisticas
+    registrar_valor("sincronizacao_paginas", estatisticas["paginas"])
+    registrar_valor("sincronizacao_bytes", estatisticas["bytes"])
+    if mudou:
+        _persistir(estado, site_id, list_id)
+
+
+def _persistir(estado, site_id, list_id):
+    metadados = {"delta_link": estado["delta_link"], "sincronizado_em": estado["sincronizado_em"],
+                 "versao": estado["versao"], "modo": estado["modo"]}
+    try:
+        salvar_estado(site_id, list_id, estado["df"], metadados)
+        estado["erro_persistencia"] = None
+    except (OSError, ValueError) as erro:
+        # Sem disco o painel continua funcionando, só perde a partida rápida
+        estado["erro_persistencia"] = erro
+
+
+def fontes_configuradas():
+    # [(nome, site_id, list_id)]: várias listas em [[LISTAS]] nos secrets, ou a lista única de SITE_ID/LIST_ID
+    listas = st.secrets.get("LISTAS")
+    if not listas:
+        return [(st.secrets.get("NOME_LISTA", "Principal"), st.secrets["SITE_ID"], st.secrets["LIST_ID"])]
+    return [(lista["nome"], lista["SITE_ID"], lista["LIST_ID"]) for lista in listas]
+
+
+def get_estatisticas_sincronizacao():
+    # Páginas e bytes transferidos na última sincronização de cada lista
+    return {nome: _estado_sincronizacao(site_id, list_id)["estatisticas"]
+            for nome, site_id, list_id in fontes_configuradas()}
+
+
+def _classificar(estado):
+    # Equipe e Status dependem do cadastro e do dia: são refeitos quando os itens mudam, a data vira
+    # ou o cadastro é editado, sem precisar buscar nada no Graph.
+    hoje = pd.Timestamp.now().normalize()
+    cadastro = cadastro_atual()
+    novo_cadastro = estado["versao_cadastro"] != cadastro["versao"]
+    if estado["classificado"] is None or estado["referencia"] != hoje or novo_cadastro:
+        with cronometro("classificacao"):
+            com_equipe, estado["sem_equipe"] = aplicar_cadastro(estado["df"], cadastro["indice"])
+            estado["classificado"] = aplicar_status(com_equipe, hoje)
+        if novo_cadastro and estado["versao_cadastro"] is not None:
+            # Itens entram e saem do painel sem passar pela sincronização: os consumidores do diário releem tudo
+            _registrar_mudancas(estado, None)
+        estado["referencia"], estado["versao_cadastro"] = hoje, cadastro["versao"]
+        estado["versao"] += 1
+    # O DataFrame é compartilhado entre sessões: cada sincronização cria um novo objeto,
+    # então quem já o recebeu nunca o vê mudar, mas ele não deve ser alterado in-place.
+    return estado["versao"], estado["classificado"]
+
+
+def _atualizar_fonte(fonte, access_token, forcar, buscar=True):
+    # buscar=False: só a versão em memória (uma notificação pediu outra lista)
+    nome, site_id, list_id = fonte
+    estado = _estado_sincronizacao(site_id, list_id)
+    with estado["lock"]:
+        vencido = forcar or time.time() - estado["sincronizado_em"] > INTERVALO_SINCRONIZACAO
+        if estado["df"] is None or (buscar and vencido):
+            try:
+                with cronometro(f"sincronizacao_{nome}"):
+                    _sincronizar(estado, site_id, list_id, access_token)
+                estado["erro"] = None
+            except Exception as erro:
+                # Falha isolada: a lista fica com a última versão boa e as outras seguem
+                estado["erro"] = erro
+        if estado["df"] is None:
+            return None
+        return _classificar(estado)
+
+
+@st.cache_resource
+def _federacao():
+    # Junção das listas, refeita só quando a versão de alguma delas muda
+    return {"lock": threading.Lock(), "chave": None, "df": None}
+
+
+def _marcar_origem(blocos_por_lista):
+    # [(nome, df)] -> um DataFrame com a coluna Origem e índice "origem:id"
+    blocos, nomes = [], [nome for nome, _ in blocos_por_lista]
+    for codigo, (nome, df) in enumerate(blocos_por_lista):
+        bloco = df.assign(Origem=pd.Categorical.from_codes(np.full(len(df), codigo), categories=nomes))
+        bloco.index = nome + ":" + df.index.astype(str)
+        blocos.append(bloco)
+    return concatenar(blocos) if len(blocos) > 1 else blocos[0]
+
+
+def _juntar(fontes, resultados):
+    # Uma linha por item de cada lista, marcada pela Origem; o índice vira "origem:id" para não colidir
+    disponiveis = [(nome, resultado) for (nome, _, _), resultado in zip(fontes, resultados) if resultado is not None]
+    if not disponiveis:
+        return None
+    chave = tuple((nome, versao) for nome, (versao, _) in disponiveis)
+    federacao = _federacao()
+    with federacao["lock"]:
+        if federacao["chave"] != chave:
+            federacao["df"] = _marcar_origem([(nome, df) for nome, (_, df) in disponiveis])
+            federacao["chave"] = chave
+        # Cada lista só aumenta a própria versão, então a soma muda sempre que alguma delas muda
+        return sum(versao for _, versao in chave), federacao["df"]
+
+
+def get_operadores_sem_equipe():
+    # {operador: itens} que estão nas listas mas não no cadastro e por isso ficam fora do painel
+    sem_equipe = {}
+    for _, site_id, list_id in fontes_configuradas():
+        for nome, total in _estado_sincronizacao(site_id, list_id)["sem_equipe"].items():
+            sem_equipe[nome] = sem_equipe.get(nome, 0) + total
+    return sem_equipe
+
+
+def get_erros_fontes():
+    # {nome: erro} das listas cuja última sincronização falhou
+    erros = {}
+    for nome, site_id, list_id in fontes_configuradas():
+        erro = _estado_sincronizacao(site_id, list_id).get("erro")
+        if erro is not None:
+            erros[nome] = erro
+    return erros
+
+
+def get_mudancas(cursores):
+    # {nome: (seq, ids)} desde os cursores {nome: seq}; ids no formato do índice federado ("origem:id"),
+    # ou None quando é preciso reler tudo (primeira leitura, lista trocada inteira ou diário já descartado)
+    resultado = {}
+    for nome, site_id, list_id in fontes_configuradas():
+        estado = _estado_sincronizacao(site_id, list_id)
+        with estado["lock"]:
+            seq, diario = estado["seq_mudancas"], list(estado["mudancas"])
+        cursor = cursores.get(nome)
+        if cursor is None or (cursor < seq and (not diario or diario[0][0] > cursor + 1)):
+            resultado[nome] = (seq, None)
+            continue
+        ids = set()
+        for numero, alterados in diario:
+            if numero <= cursor:
+                continue
+            if alterados is None:
+                ids = None
+                break
+            ids |= {f"{nome}:{item}" for item in alterados}
+        resultado[nome] = (seq, ids)
+    return resultado
+
+
+def get_dados_versionados(access_token, forcar=False, somente=None):
+    # (versao, DataFrame): a versão muda sempre que os itens ou o Status de alguma lista mudam.
+    # somente: LIST_IDs a consultar (ex.: os que receberam notificação); as outras ficam como estão.
+    fontes = fontes_configuradas()
+
+    def atualizar(fonte):
+        return _atualizar_fonte(fonte, access_token, forcar, somente is None or fonte[2] in somente)
+
+    if len(fontes) == 1:
+        resultados = [atualizar(fontes[0])]
+    else:
+        # Listas buscadas em paralelo: a atualização leva o tempo da lista mais lenta, não a soma
+        with ThreadPoolExecutor(max_workers=len(fontes), thread_name_prefix="fonte") as executor:
+            resultados = list(executor.map(atualizar, fontes))
+    juntado = _juntar(fontes, resultados)
+    if juntado is None:
+        # Nenhuma lista disponível: propaga a falha para quem chamou
+        raise next(iter(get_erros_fontes().values()), RuntimeError("Nenhuma lista configurada"))
+    return juntado
+
+
+def get_dados_locais():
+    # (versao, DataFrame, sincronizado_em) do que já está em memória ou em disco, sem consultar o Graph
+    fontes = fontes_configuradas()
+    resultados, sincronizados = [], []
+    for _, site_id, list_id in fontes:
+        estado = _estado_sincronizacao(site_id, list_id)
+        with estado["lock"]:
+            resultados.append(None if estado["df"] is None else _classificar(estado))
+            if estado["df"] is not None:
+                sincronizados.append(estado["sincronizado_em"])
+    juntado = _juntar(fontes, resultados)
+    if juntado is None:
+        return None
+    return juntado + (min(sincronizados),)
+
+
+def meses_disponiveis():
+    # Meses com itens arquivados em alguma lista, mais o corrente; do mais recente para o mais antigo
+    disponiveis = {pd.Timestamp.now().strftime("%Y-%m")}
+    for _, site_id, list_id in fontes_configuradas():
+        disponiveis.update(meses_arquivados(_estado_sincronizacao(site_id, list_id)["indice_arquivo"]))
+    return sorted(disponiveis, reverse=True)
+
+
+@st.cache_resource
+def _meses_carregados():
+    return {"lock": threading.Lock(), "lru": OrderedDict()}
+
+
+def get_dados_mes(versao, mes):
+    # Itens com vencimento no mês ("AAAA-MM"): a partição arquivada, lida sob demanda, mais o que
+    # ainda está em memória. Guardado por (versão, mês) com descarte dos menos usados.
+    cache = _meses_carregados()
+    with cache["lock"]:
+        if (versao, mes) in cache["lru"]:
+            cache["lru"].move_to_end((versao, mes))
+            return cache["lru"][(versao, mes)]
+
+    hoje = pd.Timestamp.now().normalize()
+    blocos_por_lista = []
+    for nome, site_id, list_id in fontes_configuradas():
+        estado = _estado_sincronizacao(site_id, list_id)
+        with estado["lock"]:
+            quente = estado["classificado"]
+        blocos = []
+        if quente is not None and not quente.empty:
+            blocos.append(quente[(meses(quente) == mes).to_numpy()])
+        particao = carregar_particao(site_id, list_id, mes)
+        if particao is not None:
+            blocos.append(aplicar_status(aplicar_cadastro(particao, cadastro_atual()["indice"])[0], hoje))
+        blocos = [bloco for bloco in blocos if not bloco.empty]
+        if blocos:
+            blocos_por_lista.append((nome, concatenar(blocos) if len(blocos) > 1 else blocos[0]))
+    df = _marcar_origem(blocos_por_lista) if blocos_por_lista else None
+
+    with cache["lock"]:
+        cache["lru"][(versao, mes)] = df
+        while len(cache["lru"]) > MESES_EM_MEMORIA:
+            cache["lru"].popitem(last=False)
+    return df
+
+
+def get_processed_dataframe(access_token):
+    return get_dados_versionados(access_token)[1]
@@ -0,0 +1,116 @@
+import sqlite3
+import threading
+from collections import OrderedDict
+from concurrent.futures import Future, ThreadPoolExecutor
+import streamlit as st
+from cubo import VISAO_GERAL
+from historico import TENDENCIA, carregar_tendencia, tendencia_vazia
+from visual import figuras_visao_geral, figuras_equipe, figuras_tendencia
+from metricas import cronometro, registrar_cache
+
+# Slides guardados por (versão, equipe); telas do mês corrente e de meses passados convivem no cache
+MAX_SLIDES = 48
+
+
+def _versao_dados(versao):
+    # (versao_dados, hoje) no mês corrente, ((versao_dados, mes), referencia) nos meses passados
+    return versao[0][0] if isinstance(versao[0], tuple) else versao[0]
+
+
+@st.cache_resource
+def _cache_figuras():
+    # Compartilhado entre todas as sessões do processo
+    return {"lock": threading.Lock(), "slides": OrderedDict(), "em_construcao": {}, "versao_dados": None,
+            "pre_carga": ThreadPoolExecutor(max_workers=1, thread_name_prefix="pre_carga")}
+
+
+def sequencia_slides(cubo, tendencia=True, perfil=None):
+    # Ordem do carrossel: visão geral, uma tela por equipe e a tendência no fim, ou a do perfil
+    if perfil is None:
+        return [VISAO_GERAL] + cubo["equipes"] + ([TENDENCIA] if tendencia else [])
+    # Equipes do perfil sem itens no período ficam de fora
+    equipes = cubo["equipes"] if perfil["equipes"] is None else [e for e in perfil["equipes"] if e in cubo["equipes"]]
+    sequencia = []
+    for tipo in perfil["slides"]:
+        if tipo == "visao_geral":
+            sequencia.append(VISAO_GERAL)
+        elif tipo == "equipes":
+            sequencia += equipes
+        elif tipo == "tendencia" and tendencia:
+            sequencia.append(TENDENCIA)
+    return sequencia or [VISAO_GERAL]
+
+
+def construir_slide(cubo, equipe):
+    if equipe == VISAO_GERAL:
+        return figuras_visao_geral(cubo)
+    if equipe == TENDENCIA:
+        try:
+            historico = carregar_tendencia(cubo["hoje"])
+        except (sqlite3.Error, OSError):
+            # Banco travado, corrompido ou diretório sem escrita: o slide sai vazio em vez de derrubar a tela;
+            # fica no cache só até a próxima versão dos dados, quando a leitura é tentada de novo
+            historico = tendencia_vazia()
+        return figuras_tendencia(historico)
+    return figuras_equipe(cubo, equipe)
+
+
+def get_figuras(versao, cubo, equipe):
+    # Figuras e tabelas prontas do slide de (versao, equipe); quem recebe não deve alterá-las
+    cache = _cache_figuras()
+    chave = (versao, equipe)
+    with cache["lock"]:
+        slide = cache["slides"].get(chave)
+        if slide is not None:
+            cache["slides"].move_to_end(chave)
+            registrar_cache("figuras", acerto=True)
+            return slide
+        # Se outra thread (ex.: a pré-carga) já está montando este slide, espera por ela
+        futuro = cache["em_construcao"].get(chave)
+        construir = futuro is None
+        if construir:
+            futuro = Future()
+            cache["em_construcao"][chave] = futuro
+
+    if not construir:
+        registrar_cache("figuras", acerto=True)
+        return futuro.result()
+
+    registrar_cache("figuras", acerto=False)
+    try:
+        with cronometro("figuras"):
+            slide = construir_slide(cubo, equipe)
+    except Exception as erro:
+        futuro.set_exception(erro)
+        raise
+    finally:
+        with cache["lock"]:
+            if cache["em_construcao"].get(chave) is futuro:
+                del cache["em_construcao"][chave]
+
+    futuro.set_result(slide)
+    with cache["lock"]:
+        # Snapshot novo: os slides das versões anteriores, de qualquer mês, não serão mais pedidos
+        versao_dados = _versao_dados(versao)
+        if cache["versao_dados"] is None or versao_dados > cache["versao_dados"]:
+            cache["versao_dados"] = versao_dados
+            for antiga in [c for c in cache["slides"] if _versao_dados(c[0]) < versao_dados]:
+                del cache["slides"][antiga]
+        cache["slides"][chave] = slide
+        while len(cache["slides"]) > MAX_SLIDES:
+            cache["slides"].popitem(last=False)
+    return slide
+
+
+def _pre_carregar(versao, cubo, equipe):
+    with cronometro("pre_carga"):
+        get_figuras(versao, cubo, equipe)
+
+
+def pre_carregar(versao, cubo, equipe):
+    # Monta o próximo slide numa thread enquanto o atual está na tela; na troca ele já está no cache
+    cache = _cache_figuras()
+    with cache["lock"]:
+        if (versao, equipe) in cache["slides"] or (versao, equipe) in cache["em_construcao"]:
+            return
+    cache["pre_carga"].submit(_pre_carregar, versao, cubo, equipe)
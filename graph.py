@@ -0,0 +1,124 @@
+import queue
+import threading
+import time
+import requests
+import streamlit as st
+from requests.adapters import HTTPAdapter
+from metricas import cronometro, registrar_duracao
+
+GRAPH_URL = "https://graph.microsoft.com/v1.0"
+TIMEOUT = 30
+
+# Quantas páginas podem ficar baixadas à frente do processamento
+PAGINAS_EM_ESPERA = 2
+
+# Respostas de limitação do Graph: espera o Retry-After e tenta de novo algumas vezes
+CODIGOS_LIMITACAO = (429, 503)
+TENTATIVAS_LIMITACAO = 3
+ESPERA_MAXIMA = 120
+
+
+class LimiteGraph(requests.HTTPError):
+    # O Graph continuou limitando depois das retentativas; espera é o último Retry-After em segundos
+    def __init__(self, espera, response=None):
+        super().__init__(f"Graph limitou as requisições; nova tentativa em {espera:.0f}s", response=response)
+        self.espera = espera
+
+_sessao = None
+_lock_sessao = threading.Lock()
+
+
+def get_sessao():
+    # Sessão única por processo: reaproveita conexões TCP/TLS (keep-alive) entre requisições
+    global _sessao
+    with _lock_sessao:
+        if _sessao is None:
+            sessao = requests.Session()
+            adaptador = HTTPAdapter(pool_connections=4, pool_maxsize=16)
+            sessao.mount("https://", adaptador)
+            sessao.mount("http://", adaptador)
+            _sessao = sessao
+        return _sessao
+
+
+def url_graph():
+    # GRAPH_URL nos secrets permite apontar para um Graph local (ex.: bench/mock_graph.py)
+    return st.secrets.get("GRAPH_URL", GRAPH_URL)
+
+
+def _retry_after(response, padrao):
+    # Retry-After em segundos; sem cabeçalho (ou em formato de data) usa a espera exponencial
+    try:
+        return min(float(response.headers["Retry-After"]), ESPERA_MAXIMA)
+    except (KeyError, ValueError):
+        return min(padrao, ESPERA_MAXIMA)
+
+
+def get_graph(url, headers, parar=None):
+    # GET com as retentativas de limitação; outros erros HTTP sobem como requests.HTTPError
+    sessao = get_sessao()
+    espera = 1
+    for tentativa in range(TENTATIVAS_LIMITACAO + 1):
+        with cronometro("busca_graph"):
+            response = sessao.get(url, headers=headers, timeout=TIMEOUT)
+        if response.status_code not in CODIGOS_LIMITACAO:
+            response.raise_for_status()
+            return response
+        espera = _retry_after(response, espera * 2)
+        registrar_duracao("limitacao_graph", espera)
+        if tentativa == TENTATIVAS_LIMITACAO:
+            break
+        if parar is not None:
+            if parar.wait(espera):
+                break
+        else:
+            time.sleep(espera)
+    raise LimiteGraph(espera, response)
+
+
+def nova_estatistica():
+    return {"paginas": 0, "bytes": 0}
+
+
+def iterar_paginas(url, headers, estatisticas=None):
+    # Percorre todas as páginas de uma coleção do Graph seguindo @odata.nextLink.
+    # A próxima página é baixada numa thread enquanto a atual é processada; no máximo
+    # PAGINAS_EM_ESPERA páginas ficam em memória além da que está com o chamador.
+    fila = queue.Queue(maxsize=PAGINAS_EM_ESPERA)
+    parar = threading.Event()
+
+    def entregar(elemento):
+        while not parar.is_set():
+            try:
+                fila.put(elemento, timeout=0.5)
+                return True
+            except queue.Full:
+                continue
+        return False
+
+    def produzir(url):
+        try:
+            while url and not parar.is_set():
+                response = get_graph(url, headers, parar)
+                pagina = response.json()
+                if estatisticas is not None:
+                    estatisticas["paginas"] += 1
+                    estatisticas["bytes"] += len(response.content)
+                if not entregar(("pagina", pagina)):
+                    return
+                url = pagina.get("@odata.nextLink")
+            entregar(("fim", None))
+        except Exception as erro:
+            entregar(("erro", erro))
+
+    threading.Thread(target=produzir, args=(url,), daemon=True).start()
+    try:
+        while True:
+            tipo, valor = fila.get()
+            if tipo == "fim":
+                return
+            if tipo == "erro":
+                raise valor
+            yield valor
+    finally:
+        parar.set()
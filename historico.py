@@ -0,0 +1,116 @@
+import os
+import sqlite3
+import threading
+from contextlib import contextmanager
+import pandas as pd
+import streamlit as st
+from cubo import VISAO_GERAL
+from persistencia import diretorio_dados
+
+# Slide do carrossel que mostra a evolução dos KPIs
+TENDENCIA = 'Tendência'
+
+# Quantos meses a tendência mostra
+MESES_TENDENCIA = 12
+
+# Cada linha é a foto dos KPIs de uma equipe (ou de um operador) num dia; dias passados nunca mudam.
+# O mês guarda a foto do último dia registrado nele, então a tendência não relê os dias.
+ESQUEMA = """
+CREATE TABLE IF NOT EXISTS kpi_diario (
+    dia TEXT NOT NULL, escopo TEXT NOT NULL, equipe TEXT NOT NULL, operador TEXT NOT NULL,
+    total INTEGER NOT NULL, concluidas INTEGER NOT NULL, no_prazo INTEGER NOT NULL, atrasadas INTEGER NOT NULL,
+    versao INTEGER NOT NULL,
+    PRIMARY KEY (dia, escopo, equipe, operador)
+);
+CREATE TABLE IF NOT EXISTS kpi_mensal (
+    mes TEXT NOT NULL, escopo TEXT NOT NULL, equipe TEXT NOT NULL, operador TEXT NOT NULL,
+    total INTEGER NOT NULL, concluidas INTEGER NOT NULL, no_prazo INTEGER NOT NULL, atrasadas INTEGER NOT NULL,
+    dia TEXT NOT NULL,
+    PRIMARY KEY (mes, escopo, equipe, operador)
+);
+"""
+
+COLUNAS_KPI = ["total", "concluidas", "no_prazo", "atrasadas"]
+
+_lock = threading.Lock()
+_preparados = set()
+
+
+def caminho_historico():
+    return st.secrets.get("HISTORICO_ARQUIVO", os.path.join(diretorio_dados(), "historico.sqlite"))
+
+
+@contextmanager
+def _conectar():
+    # Uma conexão por operação: o atualizador e as threads das sessões não compartilham conexões
+    caminho = caminho_historico()
+    os.makedirs(os.path.dirname(caminho) or ".", exist_ok=True)
+    conexao = sqlite3.connect(caminho, timeout=10)
+    try:
+        if caminho not in _preparados:
+            # WAL: o slide de tendência lê enquanto o atualizador grava
+            conexao.execute("PRAGMA journal_mode=WAL")
+            conexao.executescript(ESQUEMA)
+            _preparados.add(caminho)
+        with conexao:
+            yield conexao
+    finally:
+        conexao.close()
+
+
+def _linhas_kpi(cubo):
+    # Os KPIs saem das contagens do cubo: o custo depende do número de equipes e operadores, não de itens
+    equipes = cubo["kpis"][["total", "concluidas", "no_prazo"]].copy()
+    atrasadas = cubo["equipe_status"].reindex(columns=['Atrasada'], fill_value=0)['Atrasada']
+    atrasadas.index = atrasadas.index.astype(str)
+    equipes["atrasadas"] = atrasadas.reindex(equipes.index, fill_value=0)
+    equipes.loc[VISAO_GERAL, "atrasadas"] = atrasadas.sum()
+    linhas = [("equipe", equipe, "", *valores) for equipe, *valores in equipes[COLUNAS_KPI].itertuples()]
+
+    operadores = cubo["operador_status"].reindex(columns=['Concluída', 'No Prazo', 'Atrasada'], fill_value=0)
+    totais = cubo["operador_status"].sum(axis=1)
+    for (equipe, operador), total, concluidas, no_prazo, atrasadas in zip(
+            operadores.index, totais, operadores['Concluída'], operadores['No Prazo'], operadores['Atrasada']):
+        linhas.append(("operador", str(equipe), str(operador), total, concluidas, no_prazo, atrasadas))
+    return [(escopo, equipe, operador, *map(int, valores)) for escopo, equipe, operador, *valores in linhas]
+
+
+def registrar(versao, hoje, cubo):
+    # Chamado uma vez por versão dos dados; só toca as linhas do dia e do mês correntes
+    dia = pd.Timestamp(hoje).strftime("%Y-%m-%d")
+    mes = dia[:7]
+    linhas = _linhas_kpi(cubo)
+    with _lock, _conectar() as conexao:
+        # Equipes ou operadores que sumiram do período hoje não ficam com a foto anterior do dia
+        conexao.execute("DELETE FROM kpi_diario WHERE dia = ?", (dia,))
+        conexao.execute("DELETE FROM kpi_mensal WHERE mes = ?", (mes,))
+        conexao.executemany("INSERT INTO kpi_diario VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?)",
+                            [(dia, *linha, versao) for linha in linhas])
+        conexao.executemany("INSERT INTO kpi_mensal VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?)",
+                            [(mes, *linha, dia) for linha in linhas])
+
+
+def _taxa(df):
+    total = df["total"].where(df["total"] > 0)
+    return df.assign(taxa_desempenho=((df["concluidas"] + df["no_prazo"]) / total * 100).fillna(100.0))
+
+
+def tendencia_vazia():
+    # Mesmo formato de carregar_tendencia, sem linhas: para quando o histórico não pode ser lido
+    mensal = pd.DataFrame({coluna: pd.Series(dtype=int if coluna in COLUNAS_KPI else object)
+                           for coluna in ["mes", "escopo", "equipe", "operador", *COLUNAS_KPI, "dia"]})
+    diario = pd.DataFrame({coluna: pd.Series(dtype=int if coluna in COLUNAS_KPI else object)
+                           for coluna in ["dia", "escopo", "equipe", "operador", *COLUNAS_KPI, "versao"]})
+    return {"mensal": _taxa(mensal), "diario": _taxa(diario)}
+
+
+def carregar_tendencia(hoje, meses=MESES_TENDENCIA):
+    # Lê só os agregados: algumas centenas de linhas, qualquer que seja o tamanho da lista
+    inicio_mes = pd.Timestamp(hoje).replace(day=1)
+    primeiro_mes = (inicio_mes - pd.DateOffset(months=meses - 1)).strftime("%Y-%m")
+    with _conectar() as conexao:
+        mensal = pd.read_sql_query("SELECT * FROM kpi_mensal WHERE mes >= ? ORDER BY mes", conexao,
+                                   params=(primeiro_mes,))
+        diario = pd.read_sql_query("SELECT * FROM kpi_diario WHERE escopo = 'equipe' AND dia >= ? ORDER BY dia",
+                                   conexao, params=(inicio_mes.strftime("%Y-%m-%d"),))
+    return {"mensal": _taxa(mensal), "diario": _taxa(diario)}
@@ -0,0 +1,172 @@
+import os
+import threading
+import time
+import uuid
+from contextlib import contextmanager
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+import streamlit as st
+from streamlit.runtime.scriptrunner import get_script_run_ctx
+from persistencia import diretorio_dados
+
+# O arquivo de métricas é regravado no máximo uma vez a cada tanto
+INTERVALO_EXPORTACAO = 10
+# Sessão sem nenhuma execução (completa ou de fragmento) neste tempo deixa de contar como ativa
+JANELA_SESSAO_ATIVA = 300
+
+_lock = threading.Lock()
+_etapas = {}    # etapa -> {"contagem", "soma", "ultimo", "maximo"}
+_caches = {}    # (camada, "acerto" | "falta") -> contagem
+_reruns = {"completas": 0, "tiques": 0}
+_sessoes = {}   # id da sessão -> {"visto_em", "completas", "tiques"}, da menos para a mais recente
+_valores = {}   # nome -> último valor (ex.: bytes da última sincronização)
+_local = threading.local()
+_exportado_em = 0.0
+
+
+def registrar_duracao(etapa, segundos):
+    with _lock:
+        estatistica = _etapas.setdefault(etapa, {"contagem": 0, "soma": 0.0, "ultimo": 0.0, "maximo": 0.0})
+        estatistica["contagem"] += 1
+        estatistica["soma"] += segundos
+        estatistica["ultimo"] = segundos
+        estatistica["maximo"] = max(estatistica["maximo"], segundos)
+
+
+def registrar_valor(nome, valor):
+    with _lock:
+        _valores[nome] = valor
+
+
+@contextmanager
+def cronometro(etapa):
+    inicio = time.perf_counter()
+    try:
+        yield
+    finally:
+        registrar_duracao(etapa, time.perf_counter() - inicio)
+
+
+def registrar_cache(camada, acerto):
+    chave = (camada, "acerto" if acerto else "falta")
+    with _lock:
+        _caches[chave] = _caches.get(chave, 0) + 1
+
+
+def marcar_falta():
+    # Chamado dentro do corpo de uma função cacheada: o corpo só roda quando o cache falha
+    _local.falta = True
+
+
+@contextmanager
+def medir_cache(camada):
+    _local.falta = False
+    yield
+    registrar_cache(camada, acerto=not _local.falta)
+
+
+def _marcar_sessao(tipo):
+    # Cada recarga da TV ou aba nova é uma sessão nova: só as ativas ficam guardadas
+    if "id_sessao" not in st.session_state:
+        st.session_state.id_sessao = uuid.uuid4().hex[:8]
+    agora = time.time()
+    with _lock:
+        sessao = _sessoes.pop(st.session_state.id_sessao, None) or {"completas": 0, "tiques": 0}
+        sessao["visto_em"] = agora
+        _sessoes[st.session_state.id_sessao] = sessao
+        if tipo is not None:
+            sessao[tipo] += 1
+            _reruns[tipo] += 1
+        # Em ordem de atividade: as expiradas estão sempre no começo
+        for id_sessao, antiga in list(_sessoes.items()):
+            if agora - antiga["visto_em"] <= JANELA_SESSAO_ATIVA:
+                break
+            del _sessoes[id_sessao]
+
+
+def contar_rerun():
+    _marcar_sessao("completas")
+
+
+def contar_tique():
+    # Chamado de um fragmento: numa execução completa ele também roda, e aí só marca atividade
+    contexto = get_script_run_ctx()
+    _marcar_sessao("tiques" if contexto is not None and contexto.fragment_ids_this_run else None)
+
+
+def resumo():
+    with _lock:
+        return {
+            "etapas": {etapa: dict(valores) for etapa, valores in _etapas.items()},
+            "caches": dict(_caches),
+            "reruns": {**_reruns, "sessoes_ativas": len(_sessoes)},
+            "sessoes": {id_sessao: {"completas": sessao["completas"], "tiques": sessao["tiques"]}
+                        for id_sessao, sessao in _sessoes.items()},
+            "valores": dict(_valores),
+        }
+
+
+def texto_prometheus():
+    dados = resumo()
+    linhas = ["# HELP dashboard_etapa_segundos Tempo gasto em cada etapa do painel.",
+              "# TYPE dashboard_etapa_segundos summary"]
+    for etapa, valores in sorted(dados["etapas"].items()):
+        linhas.append(f'dashboard_etapa_segundos_sum{{etapa="{etapa}"}} {valores["soma"]:.6f}')
+        linhas.append(f'dashboard_etapa_segundos_count{{etapa="{etapa}"}} {valores["contagem"]}')
+    linhas += ["# HELP dashboard_etapa_segundos_max Maior duração observada de cada etapa.",
+               "# TYPE dashboard_etapa_segundos_max gauge"]
+    for etapa, valores in sorted(dados["etapas"].items()):
+        linhas.append(f'dashboard_etapa_segundos_max{{etapa="{etapa}"}} {valores["maximo"]:.6f}')
+    linhas += ["# HELP dashboard_cache_total Consultas a cada camada de cache.",
+               "# TYPE dashboard_cache_total counter"]
+    for (camada, resultado), contagem in sorted(dados["caches"].items()):
+        linhas.append(f'dashboard_cache_total{{camada="{camada}",resultado="{resultado}"}} {contagem}')
+    linhas += ["# HELP dashboard_reruns_total Execuções completas do script e de fragmentos, somando todas as sessões.",
+               "# TYPE dashboard_reruns_total counter"]
+    for tipo in ("completas", "tiques"):
+        linhas.append(f'dashboard_reruns_total{{tipo="{tipo}"}} {dados["reruns"][tipo]}')
+    # Por sessão só o máximo entre as ativas: um rótulo por sessão cresceria sem limite
+    linhas += ["# HELP dashboard_reruns_sessao_max Maior contagem de execuções entre as sessões ativas.",
+               "# TYPE dashboard_reruns_sessao_max gauge"]
+    for tipo in ("completas", "tiques"):
+        maximo = max((sessao[tipo] for sessao in dados["sessoes"].values()), default=0)
+        linhas.append(f'dashboard_reruns_sessao_max{{tipo="{tipo}"}} {maximo}')
+    linhas += ["# HELP dashboard_sessoes_ativas Sessões com atividade nos últimos minutos.",
+               "# TYPE dashboard_sessoes_ativas gauge", f"dashboard_sessoes_ativas {dados['reruns']['sessoes_ativas']}"]
+    for nome, valor in sorted(dados["valores"].items()):
+        linhas += [f"# TYPE dashboard_{nome} gauge", f"dashboard_{nome} {valor}"]
+    return "\n".join(linhas) + "\n"
+
+
+def exportar_arquivo(forcar=False):
+    # Grava as métricas em texto (formato Prometheus) para um coletor local ler
+    global _exportado_em
+    if not forcar and time.time() - _exportado_em < INTERVALO_EXPORTACAO:
+        return
+    _exportado_em = time.time()
+    caminho = st.secrets.get("METRICAS_ARQUIVO", os.path.join(diretorio_dados(), "metricas.prom"))
+    os.makedirs(os.path.dirname(caminho) or ".", exist_ok=True)
+    temporario = caminho + ".tmp"
+    with open(temporario, "w", encoding="utf-8") as arquivo:
+        arquivo.write(texto_prometheus())
+    os.replace(temporario, caminho)
+
+
+class _MetricasHandler(BaseHTTPRequestHandler):
+    def do_GET(self):
+        corpo = texto_prometheus().encode()
+        self.send_response(200)
+        self.send_header("Content-Type", "text/plain; version=0.0.4")
+        self.send_header("Content-Length", str(len(corpo)))
+        self.end_headers()
+        self.wfile.write(corpo)
+
+    def log_message(self, *args):
+        pass
+
+
+@st.cache_resource
+def iniciar_endpoint(porta):
+    # Endpoint /metrics opcional, ligado pelo secret METRICAS_PORTA
+    servidor = ThreadingHTTPServer(("127.0.0.1", porta), _MetricasHandler)
+    threading.Thread(target=servidor.serve_forever, daemon=True, name="metricas").start()
+    return servidor
@@ -0,0 +1,192 @@
+import datetime
+import hmac
+import json
+import secrets
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import parse_qs, urlparse
+import requests
+import streamlit as st
+from auth import get_access_token
+from data import fontes_configuradas
+from graph import TIMEOUT, get_sessao, url_graph
+from metricas import registrar_valor
+
+# O Graph aceita assinaturas de listas por até 30 dias; renovamos bem antes de vencer
+VALIDADE_ASSINATURA = 7 * 24 * 3600
+RENOVAR_ANTES = 24 * 3600
+INTERVALO_VERIFICACAO = 3600
+ESPERA_APOS_FALHA = 300
+# Uma mudança vista só pelo polling, sem notificação nesse tanto de tempo, indica que elas pararam
+MARGEM_SEM_AVISO = 120
+
+PORTA_PADRAO = 8765
+
+
+def notificacoes_configuradas():
+    # NOTIFICACOES_URL é o endereço público (HTTPS) que o Graph chama; sem ele só há polling
+    return "NOTIFICACOES_URL" in st.secrets
+
+
+def _iso(instante):
+    return datetime.datetime.fromtimestamp(instante, datetime.timezone.utc).strftime("%Y-%m-%dT%H:%M:%S.%fZ")
+
+
+def _instante(texto):
+    return datetime.datetime.fromisoformat(texto.replace("Z", "+00:00")).timestamp()
+
+
+class _ReceptorHandler(BaseHTTPRequestHandler):
+    def _responder(self, status, corpo=b"", tipo="text/plain"):
+        self.send_response(status)
+        self.send_header("Content-Type", tipo)
+        self.send_header("Content-Length", str(len(corpo)))
+        self.end_headers()
+        self.wfile.write(corpo)
+
+    def do_POST(self):
+        parametros = parse_qs(urlparse(self.path).query)
+        corpo = self.rfile.read(int(self.headers.get("Content-Length", 0)))
+        if "validationToken" in parametros:
+            # Handshake da criação da assinatura: o token volta em texto puro
+            self._responder(200, parametros["validationToken"][0].encode())
+            return
+        try:
+            avisos = json.loads(corpo)["value"]
+        except (ValueError, KeyError, TypeError):
+            self._responder(400)
+            return
+        # Responde antes de processar: o Graph descarta URLs que demoram a responder
+        self._responder(202)
+        receber(self.server.estado, avisos)
+
+    def log_message(self, *args):
+        pass
+
+
+def receber(estado, avisos):
+    listas = set()
+    with estado["lock"]:
+        for aviso in avisos:
+            # clientState confere a origem; assinaturas desconhecidas (ex.: antigas) são ignoradas
+            if not hmac.compare_digest(str(aviso.get("clientState", "")), estado["segredo"]):
+                continue
+            list_id = estado["por_assinatura"].get(aviso.get("subscriptionId"))
+            if list_id is not None:
+                listas.add(list_id)
+        if listas:
+            estado["ultima_notificacao"] = time.time()
+            estado["recebidas"] += 1
+            estado["silenciosa"] = False
+    registrar_valor("notificacoes_recebidas", estado["recebidas"])
+    if listas:
+        estado["ao_notificar"](listas)
+
+
+def _cabecalhos(access_token):
+    return {"Authorization": f"Bearer {access_token}"}
+
+
+def _criar(estado, access_token, site_id, list_id):
+    corpo = {"changeType": "updated", "notificationUrl": estado["url"], "resource": f"sites/{site_id}/lists/{list_id}",
+             "expirationDateTime": _iso(time.time() + VALIDADE_ASSINATURA), "clientState": estado["segredo"]}
+    resposta = get_sessao().post(f"{url_graph()}/subscriptions", json=corpo, headers=_cabecalhos(access_token),
+                                 timeout=TIMEOUT)
+    resposta.raise_for_status()
+    dados = resposta.json()
+    return {"id": dados["id"], "expira_em": _instante(dados["expirationDateTime"])}
+
+
+def _renovar(access_token, assinatura):
+    corpo = {"expirationDateTime": _iso(time.time() + VALIDADE_ASSINATURA)}
+    resposta = get_sessao().patch(f"{url_graph()}/subscriptions/{assinatura['id']}", json=corpo,
+                                  headers=_cabecalhos(access_token), timeout=TIMEOUT)
+    if resposta.status_code == 404:
+        # O Graph já removeu a assinatura (ex.: expirou): cria outra
+        return None
+    resposta.raise_for_status()
+    return {"id": assinatura["id"], "expira_em": _instante(resposta.json()["expirationDateTime"])}
+
+
+def _remover(access_token, assinatura):
+    try:
+        get_sessao().delete(f"{url_graph()}/subscriptions/{assinatura['id']}", headers=_cabecalhos(access_token),
+                            timeout=TIMEOUT)
+    except requests.RequestException:
+        pass
+
+
+def _garantir_assinatura(estado, access_token, site_id, list_id):
+    atual = estado["assinaturas"].get(list_id)
+    if atual is not None and atual["expira_em"] - time.time() > RENOVAR_ANTES:
+        return
+    nova = _renovar(access_token, atual) if atual is not None else None
+    if nova is None:
+        # A criação só termina depois que o Graph valida a URL no receptor, que já está no ar
+        nova = _criar(estado, access_token, site_id, list_id)
+    with estado["lock"]:
+        if atual is not None:
+            estado["por_assinatura"].pop(atual["id"], None)
+        estado["assinaturas"][list_id] = nova
+        estado["por_assinatura"][nova["id"]] = list_id
+
+
+def _manter_assinaturas(estado):
+    while True:
+        try:
+            access_token = get_access_token()
+            with estado["lock"]:
+                descartadas = estado.pop("descartadas", [])
+            for assinatura in descartadas:
+                _remover(access_token, assinatura)
+            for _, site_id, list_id in fontes_configuradas():
+                _garantir_assinatura(estado, access_token, site_id, list_id)
+            estado["erro"] = None
+            espera = INTERVALO_VERIFICACAO
+        except Exception as erro:
+            # Sem assinatura válida o atualizador volta ao polling normal
+            estado["erro"] = erro
+            espera = ESPERA_APOS_FALHA
+        estado["acordar"].wait(espera)
+        estado["acordar"].clear()
+
+
+@st.cache_resource
+def iniciar_notificacoes(_ao_notificar):
+    # Receptor HTTP dos avisos do Graph e a thread que cria e renova as assinaturas das listas
+    # O clientState é a única autenticação dos avisos: sem NOTIFICACOES_SEGREDO, um aleatório por processo
+    # (as assinaturas do processo anterior passam a ser ignoradas e são recriadas)
+    segredo = st.secrets.get("NOTIFICACOES_SEGREDO") or secrets.token_urlsafe(32)
+    estado = {"lock": threading.Lock(), "url": st.secrets["NOTIFICACOES_URL"],
+              "segredo": segredo, "ao_notificar": _ao_notificar,
+              "assinaturas": {}, "por_assinatura": {}, "ultima_notificacao": 0.0, "recebidas": 0,
+              "silenciosa": False, "erro": None, "acordar": threading.Event()}
+    # Só a máquina local por padrão: o endereço HTTPS público chega por um proxy reverso
+    endereco = (st.secrets.get("NOTIFICACOES_ENDERECO", "127.0.0.1"), int(st.secrets.get("NOTIFICACOES_PORTA", PORTA_PADRAO)))
+    servidor = ThreadingHTTPServer(endereco, _ReceptorHandler)
+    servidor.estado = estado
+    threading.Thread(target=servidor.serve_forever, daemon=True, name="notificacoes").start()
+    threading.Thread(target=_manter_assinaturas, args=(estado,), daemon=True, name="assinaturas").start()
+    return estado
+
+
+def ativas(estado):
+    # Todas as listas com assinatura válida e sem sinal de que os avisos pararam
+    if estado is None or estado["erro"] is not None or estado["silenciosa"]:
+        return False
+    agora = time.time()
+    return all(list_id in estado["assinaturas"] and estado["assinaturas"][list_id]["expira_em"] > agora
+               for _, _, list_id in fontes_configuradas())
+
+
+def mudanca_sem_aviso(estado):
+    # O polling encontrou uma mudança que nenhuma notificação anunciou: recria as assinaturas
+    if estado is None or time.time() - estado["ultima_notificacao"] < MARGEM_SEM_AVISO:
+        return
+    with estado["lock"]:
+        estado["silenciosa"] = True
+        estado.setdefault("descartadas", []).extend(estado["assinaturas"].values())
+        estado["assinaturas"].clear()
+        estado["por_assinatura"].clear()
+    estado["acordar"].set()
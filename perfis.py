@@ -0,0 +1,43 @@
+import streamlit as st
+
+# Perfis de exibição: cada TV escolhe o seu por ?perfil=nome (ou pelo secret PERFIL da instalação).
+# O perfil só decide o que girar e por quanto tempo; cubo e figuras continuam compartilhados por
+# (versão, equipe), então uma tela a mais não custa processamento de dados.
+INTERVALO_PADRAO = 15
+INTERVALO_MINIMO = 5
+# Tipos de slide, na ordem em que aparecem; "equipes" abre uma tela por equipe do perfil
+TIPOS_SLIDE = ("visao_geral", "equipes", "tendencia")
+
+
+def perfis_configurados():
+    # [PERFIS.nome] no secrets.toml: equipes (quais e em que ordem), intervalo (segundos) e slides (tipos)
+    return {nome: dict(perfil) for nome, perfil in st.secrets.get("PERFIS", {}).items()}
+
+
+def _lista(valor):
+    # Na URL as listas vêm como texto separado por vírgulas
+    if isinstance(valor, str):
+        return [item.strip() for item in valor.split(",") if item.strip()]
+    return list(valor)
+
+
+def _intervalo(valor):
+    try:
+        return max(INTERVALO_MINIMO, float(valor))
+    except (TypeError, ValueError):
+        return INTERVALO_PADRAO
+
+
+def resolver_perfil(parametros):
+    # Perfil nomeado com ajustes avulsos da URL por cima (?equipes=A,B&intervalo=20&slides=equipes)
+    configurados = perfis_configurados()
+    nome = parametros.get("perfil") or st.secrets.get("PERFIL")
+    perfil = {"equipes": None, "intervalo": INTERVALO_PADRAO, "slides": list(TIPOS_SLIDE)}
+    perfil.update(configurados.get(nome, {}))
+    for chave in ("equipes", "intervalo", "slides"):
+        if parametros.get(chave):
+            perfil[chave] = parametros[chave]
+    return {"nome": nome, "conhecido": nome is None or nome in configurados,
+            "equipes": None if perfil["equipes"] is None else _lista(perfil["equipes"]),
+            "intervalo": _intervalo(perfil["intervalo"]),
+            "slides": [tipo for tipo in _lista(perfil["slides"]) if tipo in TIPOS_SLIDE]}
@@ -0,0 +1,51 @@
+import json
+import os
+import pandas as pd
+import streamlit as st
+
+DIRETORIO_PADRAO = "dados_locais"
+
+
+def diretorio_dados():
+    return st.secrets.get("DIRETORIO_DADOS", DIRETORIO_PADRAO)
+
+
+def nome_fonte(site_id, list_id):
+    # Os ids de site do Graph têm vírgulas e barras; o nome vira um nome de arquivo válido
+    return f"{site_id}_{list_id}".replace(",", "_").replace("/", "_")
+
+
+def _caminhos(site_id, list_id):
+    base = os.path.join(diretorio_dados(), nome_fonte(site_id, list_id))
+    return base + ".parquet", base + ".json"
+
+
+def substituir_arquivo(caminho, escrever):
+    # Grava num arquivo temporário e troca de uma vez: quem lê nunca vê um arquivo pela metade
+    temporario = caminho + ".tmp"
+    escrever(temporario)
+    os.replace(temporario, caminho)
+
+
+def salvar_estado(site_id, list_id, df, metadados):
+    os.makedirs(diretorio_dados(), exist_ok=True)
+    caminho_df, caminho_meta = _caminhos(site_id, list_id)
+    substituir_arquivo(caminho_df, lambda caminho: df.to_parquet(caminho))
+
+    def escrever_meta(caminho):
+        with open(caminho, "w", encoding="utf-8") as arquivo:
+            json.dump(metadados, arquivo)
+    # Os metadados vão por último: um delta_link nunca aponta para itens que não foram gravados
+    substituir_arquivo(caminho_meta, escrever_meta)
+
+
+def carregar_estado(site_id, list_id):
+    # (df, metadados) da última sincronização gravada, ou None se não houver nada legível
+    caminho_df, caminho_meta = _caminhos(site_id, list_id)
+    try:
+        with open(caminho_meta, encoding="utf-8") as arquivo:
+            metadados = json.load(arquivo)
+        df = pd.read_parquet(caminho_df, memory_map=True)
+    except (OSError, ValueError):
+        return None
+    return df, metadados
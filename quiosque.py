@@ -0,0 +1,276 @@
+"""Modo quiosque: os slides saem prontos em arquivos estáticos e as TVs só giram.
+
+    python quiosque.py --porta 8600 --endereco 0.0.0.0
+
+Cada versão dos dados vira um pacote JSON (cabeçalho, desempenho, gráficos e tabelas
+de todos os slides) ao lado de um index.html que troca os slides no navegador e
+consulta versao.json para saber quando baixar o pacote novo. O custo no servidor é
+uma renderização por mudança de dados, qualquer que seja o número de TVs.
+"""
+import argparse
+import functools
+import json
+import os
+import time
+from http.server import SimpleHTTPRequestHandler, ThreadingHTTPServer
+import pandas as pd
+import plotly
+import plotly.offline
+import streamlit as st
+from alertas import alertas_recentes, texto_alerta
+from cubo import VISAO_GERAL, get_cubo, kpis_equipe
+from figuras import get_figuras, sequencia_slides
+from perfis import perfis_configurados, resolver_perfil
+from historico import TENDENCIA
+from metricas import cronometro
+from persistencia import substituir_arquivo
+from utils import CORES_EQUIPES, MESES_EM_PORTUGUES, get_cor_desempenho
+
+DIRETORIO_PADRAO = "quiosque"
+# De quanto em quanto tempo as TVs perguntam pela versão
+INTERVALO_CONSULTA_SEGUNDOS = 30
+# Pacotes antigos mantidos para TVs que ainda estão baixando o anterior
+PACOTES_MANTIDOS = 2
+# Alertas de prazo no letreiro (os mais novos)
+MAX_ALERTAS_LETREIRO = 10
+
+# Colunas de cada tipo de slide, na mesma disposição do app.py
+LAYOUTS = {
+    VISAO_GERAL: [["percentual"], ["absoluto"], ["tabela_cliente"]],
+    TENDENCIA: [["mensal"], ["atrasadas_dia"], ["tabela_operador"]],
+    None: [["tipo_pct", "colab_atividade"], ["operador_pct", "operador_abs"], ["tabela_cliente"]],
+}
+TITULOS_TABELAS = {"tabela_cliente": "Detalhamento por Cliente", "tabela_operador": "Desempenho por Operador"}
+
+def diretorio_quiosque():
+    # Ligado pela variável de ambiente (a linha de comando a define) ou pelo secret; None quando desligado
+    return os.environ.get("QUIOSQUE_DIRETORIO") or st.secrets.get("QUIOSQUE_DIRETORIO")
+
+
+def _tabela_html(nome, tabela):
+    # Nomes de clientes e operadores vêm das listas do SharePoint: escapados, a página insere o HTML como está
+    if nome == "tabela_operador":
+        estilo = tabela.style.format("{:.0f}%", na_rep="-", escape="html")
+    else:
+        estilo = tabela.style.format(precision=0, escape="html")
+    return estilo.format_index(escape="html", axis=0).format_index(escape="html", axis=1).to_html()
+
+
+def _slide(cubo, versao, equipe, hoje):
+    slide = get_figuras(versao, cubo, equipe)
+    taxa = kpis_equipe(cubo, VISAO_GERAL if equipe == TENDENCIA else equipe)["taxa_desempenho"]
+    colunas = []
+    for nomes in LAYOUTS.get(equipe, LAYOUTS[None]):
+        coluna = []
+        for nome in nomes:
+            if nome in TITULOS_TABELAS:
+                coluna.append({"tabela": _tabela_html(nome, slide[nome]), "titulo": TITULOS_TABELAS[nome]})
+            else:
+                coluna.append({"grafico": slide[nome]})
+        colunas.append(coluna)
+    return {"equipe": equipe, "cor": CORES_EQUIPES.get(equipe, "#262730"), "taxa": round(float(taxa)),
+            "cor_desempenho": get_cor_desempenho(taxa),
+            "periodo": f"{MESES_EM_PORTUGUES[hoje.month]} de {hoje.year}", "colunas": colunas}
+
+
+def exportar(versao_dados, df, diretorio):
+    # Renderiza todos os slides da versão, usando os mesmos caches das sessões do Streamlit
+    hoje = pd.Timestamp.now().date()
+    cubo = get_cubo(df, versao_dados, hoje)
+    versao = (versao_dados, hoje)
+    equipes = sequencia_slides(cubo)
+    with cronometro("quiosque"):
+        slides = [_slide(cubo, versao, equipe, hoje) for equipe in equipes]
+    identificador = f"{versao_dados}-{hoje:%Y%m%d}"
+    os.makedirs(diretorio, exist_ok=True)
+    _escrever_estaticos(diretorio)
+
+    nome_pacote = f"pacote_{identificador}.json"
+    alertas = [texto_alerta(alerta) for alerta in alertas_recentes()[:MAX_ALERTAS_LETREIRO]]
+    texto = json.dumps({"versao": identificador, "slides": slides, "perfis": _perfis(cubo, equipes), "alertas": alertas},
+                       cls=plotly.utils.PlotlyJSONEncoder, ensure_ascii=False)
+    substituir_arquivo(os.path.join(diretorio, nome_pacote), lambda caminho: _gravar(caminho, texto))
+    # versao.json por último: quem o lê sempre encontra o pacote que ele aponta
+    indice = {"versao": identificador, "pacote": nome_pacote, "gerado_em": time.time()}
+    substituir_arquivo(os.path.join(diretorio, "versao.json"), lambda caminho: _gravar(caminho, json.dumps(indice)))
+    _limpar_pacotes(diretorio)
+    return identificador
+
+
+def _perfis(cubo, equipes):
+    # Cada perfil é só uma ordem de índices sobre os slides do pacote; "" é o padrão da instalação
+    nomes = [None, *perfis_configurados()]
+    perfis = {}
+    for nome in nomes:
+        perfil = resolver_perfil({"perfil": nome} if nome else {})
+        perfis[nome or ""] = {"slides": [equipes.index(equipe) for equipe in sequencia_slides(cubo, perfil=perfil)],
+                              "intervalo": perfil["intervalo"]}
+    return perfis
+
+
+def _gravar(caminho, texto):
+    with open(caminho, "w", encoding="utf-8") as arquivo:
+        arquivo.write(texto)
+
+
+def _limpar_pacotes(diretorio):
+    pacotes = sorted((os.path.join(diretorio, nome) for nome in os.listdir(diretorio)
+                      if nome.startswith("pacote_") and nome.endswith(".json")), key=os.path.getmtime)
+    for caminho in pacotes[:-PACOTES_MANTIDOS]:
+        os.remove(caminho)
+
+
+def _escrever_estaticos(diretorio):
+    # plotly.js vai junto: as TVs não precisam de internet
+    caminho_plotly = os.path.join(diretorio, "plotly.min.js")
+    if not os.path.exists(caminho_plotly):
+        substituir_arquivo(caminho_plotly, lambda caminho: _gravar(caminho, plotly.offline.get_plotlyjs()))
+    caminho_index = os.path.join(diretorio, "index.html")
+    html = PAGINA.replace("{{INTERVALO_CONSULTA}}", str(INTERVALO_CONSULTA_SEGUNDOS * 1000))
+    if not os.path.exists(caminho_index) or open(caminho_index, encoding="utf-8").read() != html:
+        substituir_arquivo(caminho_index, lambda caminho: _gravar(caminho, html))
+
+
+PAGINA = """<!DOCTYPE html>
+<html lang="pt-BR">
+<head>
+<meta charset="utf-8">
+<title>Painel</title>
+<script src="plotly.min.js"></script>
+<style>
+    body { font-family: 'Source Sans Pro', sans-serif; margin: 16px 32px; color: #31333F; }
+    .cabecalho { display: grid; grid-template-columns: 4fr 3fr 3fr; gap: 16px; align-items: center; }
+    .bloco { padding: 12px; border-radius: 8px; text-align: center; }
+    .bloco h2 { color: white; margin: 0; }
+    .info { font-size: 14px; color: rgba(49, 51, 63, 0.6); line-height: 1.6; }
+    hr { border: none; border-top: 1px solid rgba(49, 51, 63, 0.2); margin: 16px 0; }
+    .colunas { display: grid; grid-template-columns: repeat(3, 1fr); gap: 16px; }
+    .grafico { height: 450px; }
+    .tabela { max-height: 900px; overflow: auto; font-size: 14px; }
+    .tabela table { border-collapse: collapse; width: 100%; }
+    .tabela th, .tabela td { border: 1px solid rgba(49, 51, 63, 0.1); padding: 2px 6px; }
+    #letreiro { overflow: hidden; white-space: nowrap; background: #262730; border-radius: 8px; padding: 6px 0; margin-top: 12px; }
+    #letreiro span { display: inline-block; color: white; font-size: 18px; padding-left: 100%; animation: rolar linear infinite; }
+    @keyframes rolar { from { transform: translateX(100%); } to { transform: translateX(-100%); } }
+</style>
+</head>
+<body>
+<div class="cabecalho">
+    <div id="equipe" class="bloco"><h2></h2></div>
+    <div id="desempenho" class="bloco"><h2></h2></div>
+    <div class="info"><div id="periodo"></div><div id="contagem"></div><div id="posicao"></div></div>
+</div>
+<div id="letreiro" hidden><span></span></div>
+<hr>
+<div id="colunas" class="colunas"></div>
+<script>
+// ?perfil=nome escolhe equipes, ordem e tempo desta TV entre os perfis do pacote
+const nomePerfil = new URLSearchParams(location.search).get("perfil") || "";
+let pacote = null, versao = null, ordem = [], indice = 0, intervalo = 15, troca = 0;
+
+// Textos vindos dos dados entram sempre como texto, nunca como HTML
+function legenda(seletor, rotulo, texto) {
+    const negrito = document.createElement("b");
+    negrito.textContent = rotulo;
+    document.querySelector(seletor).replaceChildren(negrito, " " + texto);
+}
+
+function mostrar() {
+    if (!pacote) return;
+    const slide = pacote.slides[ordem[indice]];
+    document.querySelector("#equipe").style.background = slide.cor;
+    document.querySelector("#equipe h2").textContent = slide.equipe;
+    document.querySelector("#desempenho").style.background = slide.cor_desempenho;
+    document.querySelector("#desempenho h2").textContent = "Desempenho: " + slide.taxa + "%";
+    legenda("#periodo", "📅 Período:", slide.periodo);
+    legenda("#posicao", "📌 Equipe:", indice + " / " + ordem.length);
+    const colunas = document.querySelector("#colunas");
+    colunas.innerHTML = "";
+    for (const itens of slide.colunas) {
+        const coluna = document.createElement("div");
+        // Na página antes de desenhar: o Plotly mede a largura da coluna
+        colunas.appendChild(coluna);
+        for (const item of itens) {
+            const elemento = document.createElement("div");
+            coluna.appendChild(elemento);
+            if (item.grafico) {
+                elemento.className = "grafico";
+                Plotly.newPlot(elemento, item.grafico.data, item.grafico.layout, {displayModeBar: false, responsive: true});
+            } else {
+                const titulo = document.createElement("h3");
+                titulo.textContent = item.titulo;
+                const tabela = document.createElement("div");
+                tabela.className = "tabela";
+                // Já escapada no servidor (_tabela_html)
+                tabela.innerHTML = item.tabela;
+                elemento.append(titulo, tabela);
+            }
+        }
+    }
+    troca = Date.now() + intervalo * 1000;
+}
+
+function mostrarAlertas(alertas) {
+    const letreiro = document.querySelector("#letreiro");
+    letreiro.hidden = alertas.length === 0;
+    const texto = letreiro.querySelector("span");
+    texto.textContent = alertas.join("   •   ");
+    texto.style.animationDuration = Math.max(20, 8 * alertas.length) + "s";
+}
+
+function contar() {
+    if (!pacote) return;
+    const proxima = pacote.slides[ordem[(indice + 1) % ordem.length]].equipe;
+    const restante = Math.max(0, Math.round((troca - Date.now()) / 1000));
+    legenda("#contagem", "🔄 Próxima equipe:", proxima + " em " + restante + " segundos");
+    if (restante === 0) { indice = (indice + 1) % ordem.length; mostrar(); }
+}
+
+async function consultar() {
+    try {
+        const atual = await (await fetch("versao.json", {cache: "no-store"})).json();
+        if (atual.versao !== versao) {
+            pacote = await (await fetch(atual.pacote)).json();
+            versao = atual.versao;
+            const perfil = pacote.perfis[nomePerfil] || pacote.perfis[""];
+            ordem = perfil.slides;
+            intervalo = perfil.intervalo;
+            indice = indice % ordem.length;
+            mostrarAlertas(pacote.alertas || []);
+            mostrar();
+        }
+    } catch (erro) {
+        // Servidor fora do ar: continua girando o último pacote
+    }
+}
+
+consultar();
+setInterval(consultar, {{INTERVALO_CONSULTA}});
+setInterval(contar, 1000);
+</script>
+</body>
+</html>
+"""
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--diretorio", default=DIRETORIO_PADRAO)
+    parser.add_argument("--porta", type=int, default=8600)
+    # Só a máquina local por padrão; para as TVs da rede, --endereco 0.0.0.0 (ou o IP da interface)
+    parser.add_argument("--endereco", default="127.0.0.1")
+    args = parser.parse_args()
+
+    # O atualizador exporta um pacote a cada snapshot novo; aqui só servimos os arquivos
+    from atualizador import obter_snapshot
+    os.environ["QUIOSQUE_DIRETORIO"] = args.diretorio
+    os.makedirs(args.diretorio, exist_ok=True)
+    obter_snapshot()
+    servidor = ThreadingHTTPServer((args.endereco, args.porta),
+                                   functools.partial(SimpleHTTPRequestHandler, directory=args.diretorio))
+    print(f"Quiosque em http://{args.endereco}:{args.porta}/ servindo {os.path.abspath(args.diretorio)}")
+    servidor.serve_forever()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,190 @@
+import html
+import pandas as pd
+import streamlit as st
+from alertas import erro_feed
+from atualizador import erros_etapas, fontes_com_erro, obter_snapshot, ultima_sincronizacao, ultimo_erro
+from cadastro import erro_cadastro
+from carrossel import posicao_fragmento
+from cubo import VISAO_GERAL, kpis_equipe
+from figuras import get_figuras, pre_carregar
+from historico import TENDENCIA
+from metricas import contar_tique, cronometro, exportar_arquivo, resumo
+from relatorios import nome_arquivo, relatorios_pedidos, solicitar_relatorios
+from utils import CORES_EQUIPES, MESES_EM_PORTUGUES, get_cor_desempenho
+from visual import contagem_regressiva, painel_diagnostico
+
+# Regiões da tela, cada uma num fragmento: na troca de slide só elas são executadas e enviadas
+# à TV, sem rodar o script inteiro (barra lateral, letreiro, seleção de mês). O script completo
+# só volta a rodar quando a versão dos dados muda ou alguém mexe num widget.
+
+# Enquanto houver relatório na fila, a barra lateral confere a fila neste intervalo
+INTERVALO_RELATORIOS = 2
+# Atualização do painel de diagnóstico (?diag=1)
+INTERVALO_DIAGNOSTICO = 5
+
+
+def _slide_atual(carrossel):
+    indice, tempo_restante = posicao_fragmento(len(carrossel["equipes"]), carrossel["intervalo"])
+    return indice, carrossel["equipes"][indice], tempo_restante
+
+
+def _equipe(carrossel):
+    with cronometro("regiao_equipe"):
+        _, equipe_atual, _ = _slide_atual(carrossel)
+        cor_fundo = CORES_EQUIPES.get(equipe_atual, "#262730")
+        html_bloco_colorido = f"""
+        <div style="background-color:{cor_fundo}; padding:12px; border-radius:8px; text-align:center;">
+            <h2 style="color:white; margin:0;">{html.escape(equipe_atual)}</h2>
+        </div>"""
+        st.markdown(html_bloco_colorido, unsafe_allow_html=True)
+
+
+def _indicador(carrossel):
+    with cronometro("regiao_indicador"):
+        _, equipe_atual, _ = _slide_atual(carrossel)
+        # O slide de tendência mostra o desempenho geral do mês
+        taxa_desempenho = kpis_equipe(carrossel["cubo"], VISAO_GERAL if equipe_atual == TENDENCIA else equipe_atual)["taxa_desempenho"]
+        cor_desempenho = get_cor_desempenho(taxa_desempenho)
+        html_gauge = f"""<div style="background-color:{cor_desempenho}; padding:12px; border-radius:8px; text-align:center;">
+            <h2 style="color:white; margin:0;">Desempenho: {taxa_desempenho:.0f}%</h2>
+        </div>
+        """
+        st.markdown(html_gauge, unsafe_allow_html=True)
+
+
+def _info(carrossel):
+    # Também é o vigia da versão dos dados: com snapshot novo, o script inteiro roda de novo
+    contar_tique()
+    try:
+        exportar_arquivo()
+    except OSError:
+        pass
+    snapshot = obter_snapshot(espera=0)
+    if snapshot is not None and snapshot.versao != carrossel["versao_dados"]:
+        st.rerun()
+    with cronometro("regiao_info"):
+        indice, _, tempo_restante = _slide_atual(carrossel)
+        equipes, referencia = carrossel["equipes"], carrossel["referencia"]
+        st.caption(f"📅 **Período:** {MESES_EM_PORTUGUES[referencia.month]} de {referencia.year}")
+        contagem_regressiva(equipes[(indice + 1) % len(equipes)], tempo_restante)
+        st.caption(f"📌 **Equipe:** {indice} / {len(equipes)}")
+        if ultimo_erro() is not None:
+            sincronizado_em = ultima_sincronizacao() or snapshot.gerado_em
+            st.caption(f"⚠️ **Falha na atualização:** exibindo dados de {pd.Timestamp.fromtimestamp(sincronizado_em):%H:%M}")
+        elif fontes_com_erro():
+            st.caption(f"⚠️ **Sem atualização de:** {', '.join(fontes_com_erro())}")
+        if not carrossel["perfil"]["conhecido"]:
+            st.caption(f"⚠️ **Perfil desconhecido:** {carrossel['perfil']['nome']}")
+
+
+def _graficos(carrossel):
+    with cronometro("regiao_graficos"):
+        indice, equipe_atual, _ = _slide_atual(carrossel)
+        slide = get_figuras(carrossel["versao"], carrossel["cubo"], equipe_atual)
+        col1, col2 = st.columns(2)
+        if equipe_atual == VISAO_GERAL:
+            with col1:
+                st.plotly_chart(slide["percentual"], use_container_width=True)
+            with col2:
+                st.plotly_chart(slide["absoluto"], use_container_width=True)
+        elif equipe_atual == TENDENCIA:
+            with col1:
+                st.plotly_chart(slide["mensal"], use_container_width=True)
+            with col2:
+                st.plotly_chart(slide["atrasadas_dia"], use_container_width=True)
+        else:
+            with col1:
+                st.plotly_chart(slide["tipo_pct"], use_container_width=True)
+                st.plotly_chart(slide["colab_atividade"], use_container_width=True)
+            with col2:
+                st.plotly_chart(slide["operador_pct"], use_container_width=True)
+                st.plotly_chart(slide["operador_abs"], use_container_width=True)
+    # Prepara o próximo slide durante o tempo de exibição do atual
+    equipes = carrossel["equipes"]
+    pre_carregar(carrossel["versao"], carrossel["cubo"], equipes[(indice + 1) % len(equipes)])
+
+
+def _tabela(carrossel):
+    with cronometro("regiao_tabela"):
+        _, equipe_atual, _ = _slide_atual(carrossel)
+        slide = get_figuras(carrossel["versao"], carrossel["cubo"], equipe_atual)
+        if equipe_atual == VISAO_GERAL:
+            st.subheader("Detalhamento por Cliente")
+            st.dataframe(slide["tabela_cliente"])
+        elif equipe_atual == TENDENCIA:
+            st.subheader("Desempenho por Operador")
+            st.dataframe(slide["tabela_operador"].style.format("{:.0f}%", na_rep="-"))
+        else:
+            st.subheader("Detalhamento por Cliente")
+            # Aplica o CSS e exibe a tabela com altura igual às outras colunas
+            st.markdown('<div class="dataframe-container">', unsafe_allow_html=True)
+            st.dataframe(slide["tabela_cliente"].style.format(precision=0))
+            st.markdown('</div>', unsafe_allow_html=True)
+
+
+def _relatorios(pedido):
+    versao, mes = pedido["versao"], pedido["mes"]
+    st.subheader("Relatórios")
+    tarefas = relatorios_pedidos(versao, mes)
+    if tarefas is None and st.button("Gerar relatórios do mês"):
+        solicitar_relatorios(versao, mes, pedido["cubo"])
+        # Execução completa: o fragmento volta montado com o timer que acompanha a fila
+        st.rerun()
+    for equipe, futuro in (tarefas or {}).items():
+        if not futuro.done():
+            st.caption(f"⏳ {equipe}")
+        elif futuro.exception() is not None:
+            st.caption(f"⚠️ {equipe}: {futuro.exception()}")
+        else:
+            st.download_button(equipe, futuro.result(), file_name=nome_arquivo(mes, equipe), on_click="ignore",
+                               mime="application/vnd.openxmlformats-officedocument.wordprocessingml.document")
+    if pedido["acompanhando"] and all(futuro.done() for futuro in tarefas.values()):
+        # Fila vazia: outra execução completa monta o fragmento sem timer
+        st.rerun()
+
+
+def _diagnostico(_):
+    painel_diagnostico(resumo(), {"Cadastro": erro_cadastro(), **erros_etapas(), "Feed de alertas": erro_feed()})
+
+
+def _regiao(funcao, argumento, a_cada):
+    # run_every depende do perfil da TV, então o fragmento é montado a cada execução completa;
+    # o id dele (módulo, nome e posição na página) continua o mesmo
+    st.fragment(funcao, run_every=a_cada)(argumento)
+
+
+def _a_cada_slide(carrossel):
+    # Com um slide só não há troca: as regiões do slide esperam a próxima versão dos dados
+    return carrossel["intervalo"] if len(carrossel["equipes"]) > 1 else None
+
+
+def regiao_equipe(carrossel):
+    _regiao(_equipe, carrossel, _a_cada_slide(carrossel))
+
+
+def regiao_indicador(carrossel):
+    _regiao(_indicador, carrossel, _a_cada_slide(carrossel))
+
+
+def regiao_info(carrossel):
+    _regiao(_info, carrossel, carrossel["intervalo"])
+
+
+def regiao_graficos(carrossel):
+    _regiao(_graficos, carrossel, _a_cada_slide(carrossel))
+
+
+def regiao_tabela(carrossel):
+    _regiao(_tabela, carrossel, _a_cada_slide(carrossel))
+
+
+def regiao_relatorios(versao, mes, cubo):
+    # Relatórios em Word do mês exibido, montados num pool de processos fora do painel
+    tarefas = relatorios_pedidos(versao, mes)
+    acompanhando = tarefas is not None and not all(futuro.done() for futuro in tarefas.values())
+    pedido = {"versao": versao, "mes": mes, "cubo": cubo, "acompanhando": acompanhando}
+    _regiao(_relatorios, pedido, INTERVALO_RELATORIOS if acompanhando else None)
+
+
+def regiao_diagnostico():
+    _regiao(_diagnostico, None, INTERVALO_DIAGNOSTICO)
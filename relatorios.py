@@ -0,0 +1,179 @@
+"""Relatórios mensais em Word: um geral e um por equipe, com os dados do carrossel.
+
+    python relatorios.py --mes 2026-09 --diretorio relatorios
+
+Os documentos são montados num pool de processos separado do Streamlit, com prioridade
+baixa, e guardados por (mês, versão dos dados): pedir de novo o mesmo mês sem mudança
+nos dados devolve os arquivos já prontos.
+"""
+import argparse
+import io
+import multiprocessing
+import os
+import re
+import threading
+from collections import OrderedDict
+from concurrent.futures import ProcessPoolExecutor
+import pandas as pd
+import streamlit as st
+from docx import Document
+from docx.shared import Cm
+from cubo import VISAO_GERAL, fatia, kpis_equipe
+from utils import MESES_EM_PORTUGUES
+from visual import figuras_equipe, figuras_visao_geral
+
+# Processos do pool; poucos e com prioridade baixa para não competir com os painéis
+PROCESSOS_PADRAO = 2
+PRIORIDADE_PROCESSOS = 10
+# Meses (de uma versão dos dados) cujos relatórios ficam guardados em memória
+MAX_MESES = 4
+
+STATUS = ['Concluída', 'No Prazo', 'Próximo do Vencimento', 'Atrasada']
+GRAFICOS_GERAL = ["percentual", "absoluto"]
+GRAFICOS_EQUIPE = ["tipo_pct", "operador_pct", "operador_abs", "colab_atividade"]
+
+
+def titulo_mes(mes):
+    return f"{MESES_EM_PORTUGUES[int(mes[5:])]} de {mes[:4]}"
+
+
+def nome_arquivo(mes, equipe):
+    nome = re.sub(r"\W+", "_", equipe).strip("_")
+    return f"relatorio_{mes}_{nome}.docx"
+
+
+def _tabela(documento, df, titulo, formato="{:.0f}"):
+    documento.add_heading(titulo, level=2)
+    if df.empty:
+        documento.add_paragraph("Sem itens no período.")
+        return
+    df = df.reset_index()
+    tabela = documento.add_table(rows=1, cols=len(df.columns), style="Light Grid Accent 1")
+    for celula, coluna in zip(tabela.rows[0].cells, df.columns):
+        celula.text = str(coluna)
+    textos = df.astype(str)
+    for coluna in df.columns:
+        if pd.api.types.is_numeric_dtype(df[coluna]):
+            textos[coluna] = df[coluna].map(formato.format)
+    for linha in textos.itertuples(index=False):
+        for celula, texto in zip(tabela.add_row().cells, linha):
+            celula.text = texto
+
+
+def _grafico(documento, figura):
+    # A exportação em PNG precisa do kaleido; sem ele o relatório sai só com as tabelas
+    try:
+        imagem = figura.to_image(format="png", width=1000, height=500)
+    except (ValueError, RuntimeError, ImportError):
+        return False
+    documento.add_picture(io.BytesIO(imagem), width=Cm(16))
+    return True
+
+
+def _kpis(documento, kpis):
+    documento.add_heading("Indicadores", level=2)
+    for rotulo, chave in [("Atividades", "total"), ("Concluídas", "concluidas"), ("No prazo", "no_prazo")]:
+        documento.add_paragraph(f"{rotulo}: {kpis[chave]:.0f}", style="List Bullet")
+    documento.add_paragraph(f"Desempenho: {kpis['taxa_desempenho']:.0f}%", style="List Bullet")
+
+
+def gerar_documento(cubo, equipe, mes):
+    # Roda nos processos do pool: recebe só o cubo (tabelas agregadas), nunca as linhas
+    documento = Document()
+    documento.add_heading(f"{equipe} — {titulo_mes(mes)}", level=1)
+    _kpis(documento, kpis_equipe(cubo, equipe))
+    if equipe == VISAO_GERAL:
+        figuras = figuras_visao_geral(cubo)
+        kpis = cubo["kpis"].drop(index=VISAO_GERAL)[["total", "concluidas", "no_prazo", "taxa_desempenho"]]
+        _tabela(documento, kpis.rename(columns={"total": "Atividades", "concluidas": "Concluídas",
+                                                "no_prazo": "No Prazo", "taxa_desempenho": "Desempenho (%)"}),
+                "Desempenho por Equipe")
+        _tabela(documento, cubo["equipe_status"].reindex(columns=STATUS, fill_value=0), "Status por Equipe")
+        nomes_graficos = GRAFICOS_GERAL
+    else:
+        figuras = figuras_equipe(cubo, equipe)
+        _tabela(documento, fatia(cubo, "atividade_status", equipe, STATUS), "Status por Tipo de Atividade")
+        _tabela(documento, fatia(cubo, "operador_status", equipe, STATUS), "Status por Operador")
+        nomes_graficos = GRAFICOS_EQUIPE
+    _tabela(documento, figuras["tabela_cliente"], "Detalhamento por Cliente")
+
+    documento.add_heading("Gráficos", level=2)
+    if not all([_grafico(documento, figuras[nome]) for nome in nomes_graficos]):
+        documento.add_paragraph("Gráficos indisponíveis: a exportação de imagens do Plotly requer o pacote kaleido.")
+    saida = io.BytesIO()
+    documento.save(saida)
+    return saida.getvalue()
+
+
+def _iniciar_processo():
+    try:
+        os.nice(PRIORIDADE_PROCESSOS)
+    except (AttributeError, OSError):
+        pass
+
+
+@st.cache_resource
+def _relatorios():
+    # spawn: os processos não herdam as threads e locks do servidor do Streamlit
+    processos = int(st.secrets.get("RELATORIOS_PROCESSOS", PROCESSOS_PADRAO))
+    pool = ProcessPoolExecutor(max_workers=processos, mp_context=multiprocessing.get_context("spawn"),
+                               initializer=_iniciar_processo)
+    return {"lock": threading.Lock(), "pool": pool, "meses": OrderedDict()}
+
+
+def solicitar_relatorios(versao, mes, cubo):
+    # Enfileira o geral e um por equipe; só retorna os futuros, sem esperar nenhum documento
+    estado = _relatorios()
+    chave = (mes, versao)
+    with estado["lock"]:
+        tarefas = estado["meses"].get(chave)
+        if tarefas is None:
+            tarefas = {equipe: estado["pool"].submit(gerar_documento, cubo, equipe, mes)
+                       for equipe in [VISAO_GERAL] + cubo["equipes"]}
+            estado["meses"][chave] = tarefas
+            while len(estado["meses"]) > MAX_MESES:
+                estado["meses"].popitem(last=False)
+        estado["meses"].move_to_end(chave)
+    return tarefas
+
+
+def relatorios_pedidos(versao, mes):
+    # Futuros de (mês, versão) já pedidos, ou None
+    estado = _relatorios()
+    with estado["lock"]:
+        return estado["meses"].get((mes, versao))
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--mes", help="AAAA-MM; padrão: mês corrente")
+    parser.add_argument("--diretorio", default="relatorios")
+    args = parser.parse_args()
+
+    from atualizador import obter_snapshot
+    from cubo import get_cubo
+    from data import get_dados_mes
+    snapshot = obter_snapshot()
+    if snapshot is None:
+        raise SystemExit("Sem dados: a primeira sincronização não terminou.")
+    hoje = pd.Timestamp.now().date()
+    mes = args.mes or f"{hoje:%Y-%m}"
+    if mes == f"{hoje:%Y-%m}":
+        versao, cubo = (snapshot.versao, hoje), get_cubo(snapshot.df, snapshot.versao, hoje)
+    else:
+        referencia = pd.Period(mes).end_time.date()
+        df_mes = get_dados_mes(snapshot.versao, mes)
+        if df_mes is None:
+            raise SystemExit(f"Sem dados para {mes}.")
+        versao, cubo = ((snapshot.versao, mes), referencia), get_cubo(df_mes, (snapshot.versao, mes), referencia)
+
+    os.makedirs(args.diretorio, exist_ok=True)
+    for equipe, futuro in solicitar_relatorios(versao, mes, cubo).items():
+        caminho = os.path.join(args.diretorio, nome_arquivo(mes, equipe))
+        with open(caminho, "wb") as arquivo:
+            arquivo.write(futuro.result())
+        print(caminho)
+
+
+if __name__ == "__main__":
+    main()
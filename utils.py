@@ -4,6 +4,13 @@ CORES_EQUIPES = {
     "Técnico": "#CC79A7", "Comercial": "#E69F00", "Operação - Industrial": "#56B4E9"
 }
 
+CORES_STATUS = {
+    "Concluída": "#00CC96",
+    "No Prazo": "#D3D3D3",
+    "Próximo do Vencimento": "#FFD700",
+    "Atrasada": "#EF553B"
+}
+
 MESES_EM_PORTUGUES = {
     1: "Janeiro", 2: "Fevereiro", 3: "Março", 4: "Abril",
     5: "Maio", 6: "Junho", 7: "Julho", 8: "Agosto",
@@ -1,5 +1,12 @@
+import html
+import json
+import numpy as np
+import pandas as pd
 import streamlit as st
 import plotly.graph_objects as go
+import streamlit.components.v1 as components
+from cubo import fatia, percentual
+from utils import CORES_EQUIPES, CORES_STATUS, MESES_EM_PORTUGUES
 
 def card_metric(titulo, valor, cor):
     st.markdown(f"""
@@ -37,3 +44,207 @@ def desempenho_colaborador(df_para_exibir, status_esperados):
 
     fig_colab.update_layout(barmode='stack', height=500)
     st.plotly_chart(fig_colab, use_container_width=True)
+
+def contagem_regressiva(equipe_proxima, segundos):
+    # A contagem roda no navegador: não exige rerun do script a cada segundo
+    # (o nome vai como literal JS; "</" escapado para não fechar a tag <script>)
+    nome_proxima = json.dumps(equipe_proxima).replace("</", "<\\/")
+    components.html(f"""
+    <div id="contagem" style="font-family:'Source Sans Pro',sans-serif;font-size:14px;color:rgba(49,51,63,0.6);"></div>
+    <script>
+        const fim = Date.now() + {max(int(segundos), 0)} * 1000;
+        const alvo = document.getElementById("contagem");
+        function atualizar() {{
+            const restante = Math.max(0, Math.round((fim - Date.now()) / 1000));
+            const rotulo = document.createElement("b");
+            rotulo.textContent = "Próxima equipe:";
+            // Nome da equipe como texto: vem do cadastro, que pode estar numa lista do SharePoint
+            alvo.replaceChildren("🔄 ", rotulo, " " + {nome_proxima} + " em " + restante + " segundos");
+        }}
+        atualizar();
+        setInterval(atualizar, 1000);
+    </script>
+    """, height=24)
+
+def letreiro(textos, segundos_por_alerta=8):
+    # Faixa que rola sozinha no navegador (CSS), sem rerun; um alerta novo entra no rerun seguinte
+    conteudo = " &nbsp;&nbsp;•&nbsp;&nbsp; ".join(html.escape(texto) for texto in textos)
+    st.markdown(f"""
+    <style>
+        @keyframes rolar-letreiro {{ from {{ transform: translateX(100%); }} to {{ transform: translateX(-100%); }} }}
+    </style>
+    <div style="overflow:hidden;white-space:nowrap;background-color:#262730;border-radius:8px;padding:6px 0;">
+        <div style="display:inline-block;color:white;font-size:18px;padding-left:100%;
+                    animation:rolar-letreiro {max(20, segundos_por_alerta * len(textos))}s linear infinite;">{conteudo}</div>
+    </div>""", unsafe_allow_html=True)
+
+def painel_diagnostico(dados, erros=None):
+    # Visível só com ?diag=1 na URL; erros: {origem: exceção ou None}
+    with st.expander("🔧 Diagnóstico", expanded=True):
+        for origem, erro in (erros or {}).items():
+            if erro is not None:
+                st.caption(f"⚠️ **{origem}:** {erro}")
+        col_etapas, col_caches, col_reruns = st.columns([3, 2, 1])
+        with col_etapas:
+            etapas = pd.DataFrame.from_dict(dados["etapas"], orient="index")
+            if not etapas.empty:
+                etapas["media"] = etapas["soma"] / etapas["contagem"]
+                st.dataframe((etapas[["contagem", "ultimo", "media", "maximo"]] * [1, 1000, 1000, 1000]).style.format(precision=1))
+                st.caption("Tempos em milissegundos")
+        with col_caches:
+            caches = pd.Series(dados["caches"], dtype=int)
+            if not caches.empty:
+                st.dataframe(caches.unstack(fill_value=0))
+            for nome, valor in dados["valores"].items():
+                st.caption(f"**{nome}:** {valor}")
+        with col_reruns:
+            st.dataframe(pd.Series(dados["reruns"], name="reruns", dtype=int))
+        sessoes = pd.DataFrame.from_dict(dados["sessoes"], orient="index", columns=["completas", "tiques"])
+        if not sessoes.empty:
+            st.caption("Execuções por sessão ativa (completas e trocas de slide pelos fragmentos)")
+            st.dataframe(sessoes.sort_values("completas", ascending=False))
+
+
+def rotulos_percentuais(serie):
+    # Mesmo texto de f'{x:.0f}%' (vazio quando zero), formatado para a coluna inteira de uma vez
+    valores = serie.to_numpy(dtype=float)
+    textos = np.char.add(np.round(valores).astype(int).astype(str), '%')
+    return np.where(valores > 0, textos, '')
+
+
+def figuras_visao_geral(cubo):
+    status_order = ['Concluída', 'Próximo do Vencimento', 'Atrasada']
+
+    df_percentual = percentual(cubo["equipe_status"]).reindex(columns=status_order, fill_value=0)
+    fig1 = go.Figure()
+    for status in status_order:
+        pattern_shape = "/" if status == "Atrasada" else ""
+        fig1.add_trace(go.Bar(y=df_percentual.index, x=df_percentual[status], name=status, orientation='h', marker_color=CORES_STATUS[status], marker_pattern_shape=pattern_shape))
+    fig1.update_layout(title='Distribuição Percentual das Atividades por Equipe', barmode='stack', legend=dict(orientation="h", y=-0.5, x=0.5, xanchor='center'))
+
+    df_absoluto = cubo["equipe_status"].reindex(columns=status_order, fill_value=0)
+    fig2 = go.Figure()
+    for status in status_order:
+        pattern_shape = "/" if status == "Atrasada" else ""
+        fig2.add_trace(go.Bar(x=df_absoluto.index, y=df_absoluto[status], name=status, marker_color=CORES_STATUS[status], marker_pattern_shape=pattern_shape))
+    fig2.update_layout(title='Número Absoluto das Atividades por Equipe', barmode='stack', legend=dict(orientation="h", y=-0.5, x=0.5, xanchor='center'))
+
+    return {"percentual": fig1, "absoluto": fig2, "tabela_cliente": cubo["cliente_status"]}
+
+
+def figuras_equipe(cubo, equipe):
+    status_esperados = ['Concluída', 'No Prazo', 'Próximo do Vencimento', 'Atrasada']
+
+    df_tipo_pct = percentual(fatia(cubo, "atividade_status", equipe)).reindex(columns=status_esperados, fill_value=0)
+    fig1 = go.Figure()
+    for status in status_esperados:
+        fig1.add_trace(go.Bar(
+            y=df_tipo_pct.index,
+            x=df_tipo_pct[status],
+            name=status,
+            orientation='h',
+            text=rotulos_percentuais(df_tipo_pct[status]),
+            textposition='auto',
+            marker_color=CORES_STATUS[status],
+            marker_pattern_shape='/' if status == 'Atrasada' else ''
+        ))
+    fig1.update_layout(
+        title='Tipo de Atividade por Status (%)',
+        barmode='stack',
+        legend=dict(orientation='h', y=-0.2, x=0.5, xanchor='center')
+    )
+
+    df_colab_atividade = fatia(cubo, "operador_atividade", equipe)
+    fig2 = go.Figure()
+    for atividade in df_colab_atividade.columns:
+        fig2.add_trace(go.Bar(
+            x=df_colab_atividade.index,
+            y=df_colab_atividade[atividade],
+            name=atividade,
+            text=df_colab_atividade[atividade],
+            textposition='auto',
+            orientation='v'
+        ))
+    fig2.update_layout(
+        title='Colaboradores x Tipo de Atividade',
+        barmode='stack',
+        legend=dict(orientation='h', y=-0.2, x=0.5, xanchor='center')
+    )
+
+    df_operador_pct = percentual(fatia(cubo, "operador_status", equipe)).reindex(columns=status_esperados, fill_value=0)
+    fig3 = go.Figure()
+    for status in status_esperados:
+        fig3.add_trace(go.Bar(
+            y=df_operador_pct.index,
+            x=df_operador_pct[status],
+            name=status,
+            orientation='h',
+            text=rotulos_percentuais(df_operador_pct[status]),
+            textposition='inside',
+            marker_color=CORES_STATUS[status],
+            marker_pattern_shape='/' if status == 'Atrasada' else ''
+        ))
+    fig3.update_layout(
+        title='Operadores x Status das Atividades (%)',
+        barmode='stack',
+        legend=dict(orientation='h', y=-0.5, x=0.5, xanchor='center')
+    )
+
+    df_operador_abs = fatia(cubo, "operador_status", equipe, status_esperados)
+    fig4 = go.Figure()
+    for status in status_esperados:
+        fig4.add_trace(go.Bar(
+            x=df_operador_abs.index,
+            y=df_operador_abs[status],
+            name=status,
+            orientation='v',
+            text=df_operador_abs[status],
+            textposition='auto',
+            marker_color=CORES_STATUS[status],
+            marker_pattern_shape='/' if status == 'Atrasada' else ''
+        ))
+    fig4.update_layout(
+        title='Operadores x Status das Atividades (Absoluto)',
+        barmode='stack',
+        legend=dict(orientation='h', y=-0.5, x=0.5, xanchor='center')
+    )
+
+    tabela_cliente = fatia(cubo, "equipe_cliente_status", equipe, status_esperados)
+    tabela_cliente = tabela_cliente.sort_values(by='Atrasada', ascending=False)
+
+    return {"tipo_pct": fig1, "colab_atividade": fig2, "operador_pct": fig3, "operador_abs": fig4, "tabela_cliente": tabela_cliente}
+
+
+def _rotulo_mes(mes):
+    # '2026-10' -> 'Out/26'
+    ano, numero = mes.split("-")
+    return f"{MESES_EM_PORTUGUES[int(numero)][:3]}/{ano[2:]}"
+
+
+def figuras_tendencia(historico):
+    # Lê só os agregados diários e mensais do histórico, nunca os itens
+    mensal = historico["mensal"]
+    equipes_mes = mensal[mensal["escopo"] == "equipe"]
+    fig1 = go.Figure()
+    for equipe, linhas in equipes_mes.groupby("equipe", sort=True):
+        fig1.add_trace(go.Scatter(x=linhas["mes"].map(_rotulo_mes), y=linhas["taxa_desempenho"], name=equipe,
+                                  mode='lines+markers', line_color=CORES_EQUIPES.get(equipe),
+                                  line_width=4 if equipe == "Visão Geral" else 2))
+    fig1.update_layout(title='Desempenho Mensal por Equipe (%)', yaxis_range=[0, 105],
+                       legend=dict(orientation='h', y=-0.3, x=0.5, xanchor='center'))
+
+    diario = historico["diario"]
+    fig2 = go.Figure()
+    for equipe, linhas in diario.groupby("equipe", sort=True):
+        fig2.add_trace(go.Scatter(x=pd.to_datetime(linhas["dia"]), y=linhas["atrasadas"], name=equipe,
+                                  mode='lines+markers', line_color=CORES_EQUIPES.get(equipe)))
+    fig2.update_layout(title='Atividades Atrasadas no Mês (por dia)',
+                       legend=dict(orientation='h', y=-0.3, x=0.5, xanchor='center'))
+
+    operadores = mensal[mensal["escopo"] == "operador"]
+    tabela_operador = operadores.pivot_table(index=["equipe", "operador"], columns="mes", values="taxa_desempenho")
+    tabela_operador = tabela_operador.iloc[:, -6:]
+    tabela_operador.columns = tabela_operador.columns.map(_rotulo_mes).rename(None)
+    tabela_operador.index.names = ["Equipe", "Operador"]
+
+    return {"mensal": fig1, "atrasadas_dia": fig2, "tabela_operador": tabela_operador}